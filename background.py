@@ -0,0 +1,72 @@
+# This file holds the cached starfield that can be drawn behind the arena instead of the nebula particles.
+import math
+import random
+
+import pygame as pg
+
+import utils
+from colors import Color
+
+TILE_SIZE = 512
+# Parallax depth of each layer (how fast it scrolls compared to the game objects) and the stars in each tile.
+LAYERS = ((0.5, 16), (0.75, 10))
+STAR_RADIUS = (1, 3)
+# Number of brightness steps used to tint the tiles by their distance from the arena center.
+TINT_LEVELS = 16
+# Distance from the center of a tile to its corner.
+TILE_REACH = TILE_SIZE * math.sqrt(2) / 2
+
+
+class StarLayer:
+    """One tile of stars repeated across the screen, scrolled at a fraction of the camera speed."""
+    def __init__(self, depth: float, star_count: int, seed: int):
+        self.depth = depth
+        rng = random.Random(seed)
+        self.image = pg.Surface((TILE_SIZE, TILE_SIZE))
+        self.image.fill(Color.BLACK)
+        for _ in range(star_count):
+            radius = rng.randint(*STAR_RADIUS)
+            # Keep the stars inside the tile so they don't get cut off at the seams.
+            pos = (rng.randint(radius, TILE_SIZE - radius), rng.randint(radius, TILE_SIZE - radius))
+            pg.draw.circle(self.image, Color.WHITE, pos, radius)
+        self.tiles = utils.ImageCache(self.make_tinted_tile)
+        self.tiles.warm_up(range(1, TINT_LEVELS + 1))
+
+    def make_tinted_tile(self, level: int) -> pg.Surface:
+        tile = self.image.copy()
+        brightness = 255 * level // TINT_LEVELS
+        tile.fill((brightness, brightness, brightness), special_flags=pg.BLEND_MULT)
+        return tile
+
+    def draw(self, screen: pg.Surface, camera: pg.Vector2, arena_radius: float, scale: float = 1.0):
+        # Work out the tiles at full scale, then scale their positions and images.
+        size = pg.Vector2(screen.size) / scale
+        # The layer lines up with the arena at the arena center, and lags behind the camera everywhere else.
+        offset = (size / 2).lerp(camera, self.depth)
+        first_x = math.floor(-offset.x / TILE_SIZE)
+        first_y = math.floor(-offset.y / TILE_SIZE)
+        last_x = math.floor((size.x - offset.x) / TILE_SIZE)
+        last_y = math.floor((size.y - offset.y) / TILE_SIZE)
+        blits = []
+        for tile_y in range(first_y, last_y + 1):
+            for tile_x in range(first_x, last_x + 1):
+                pos = pg.Vector2(tile_x * TILE_SIZE, tile_y * TILE_SIZE) + offset
+                # Dark at arena center, full white at arena edge, and nothing outside the arena.
+                distance = (pos + (TILE_SIZE / 2, TILE_SIZE / 2) - camera).length()
+                if distance - TILE_REACH > arena_radius:
+                    continue
+                level = min(round(distance / arena_radius * TINT_LEVELS), TINT_LEVELS)
+                if level:
+                    blits.append((self.tiles.get_scaled_image(level, scale), pos * scale))
+        screen.fblits(blits, pg.BLEND_ADD)  # noqa
+
+
+class Starfield:
+    """Pre-rendered star tiles at a few parallax depths. Drawing it costs the same no matter how many stars there
+    are, and needs no per-star updates."""
+    def __init__(self, seed: int = 0):
+        self.layers = [StarLayer(depth, star_count, seed + i) for i, (depth, star_count) in enumerate(LAYERS)]
+
+    def draw(self, screen: pg.Surface, camera: pg.Vector2, arena_radius: float, scale: float = 1.0):
+        for layer in self.layers:
+            layer.draw(screen, camera, arena_radius, scale)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# This file holds the Monte Carlo balance runner.
+#
+# It plays thousands of headless games with the nearest enemy autopilot across all cores. Every game gets its own
+# seed and randomly scaled tuning values, and the results of each wave are written as one row of a columnar .npz file,
+# where every column is a NumPy array. Load it with numpy.load and compare runs before and after a balance change.
+#
+# Example: "balance.py --games 2000 --spread 0.25 --output balance.npz"
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pygame as pg
+
+import utils
+import sprites
+from sprites import ObjectShape
+from controllers import NearestEnemyController, WorldView
+from world import World
+from main import SOUND_DIRECTORY, WINDOWED_RESOLUTION, GAME_TITLE
+
+TICK_RATE = 60
+# A game ends after this many waves, and a wave that takes longer than this many seconds is given up on.
+MAX_WAVES = 20
+MAX_WAVE_TIME = 180
+# The game is over once the player has been dead this long, same as the pause in the game.
+DEATH_DELAY = 2
+# Copies of each powerup in a loot table at a weight of 1, so the tier weights can be applied as repeated entries.
+LOOT_COPIES = 4
+# How many waves earlier or later the enemy types can be introduced, at a spread of 1.
+WAVE_OFFSET_SPREAD = 8
+# Shapes left out of the enemy health and thrust scaling. Drones fly for both sides and switch sides mid game.
+UNTUNED_SHAPES = (ObjectShape.POWER_UP, ObjectShape.DRONE)
+
+
+class Tuning(NamedTuple):
+    """Tuning values for one game. The scales multiply the values in the ``sprites`` tables."""
+    drop_rate: float = 1.0
+    enemy_health: float = 1.0
+    player_health: int = sprites.HEALTH[ObjectShape.PLAYER]
+    enemy_thrust: float = 1.0
+    player_thrust: float = 1.0
+    base_enemies: int = 2
+    # Weights of the better and best powerup tiers in the loot tables, relative to the other powerups.
+    better_loot: float = 1.0
+    best_loot: float = 1.0
+    # Waves added to the wave each enemy type is introduced in. Negative values bring them in earlier.
+    wave_offset: int = 0
+
+
+# Result columns and their types. Each row is one wave of one game.
+COLUMNS = {
+    "game": np.int32,
+    "seed": np.int64,
+    **{f"tuning_{field}": np.float32 for field in Tuning._fields},
+    "wave": np.int16,
+    # 0 if the wave was cleared, 1 if the player died and 2 if the wave took too long.
+    "outcome": np.int8,
+    "survival_time": np.float32,
+    "damage_taken": np.float32,
+    "powerups_collected": np.int16,
+    "ticks_per_second": np.float32,
+}
+CLEARED = 0
+DIED = 1
+TIMED_OUT = 2
+
+DEFAULT_DROP_RATE = dict(sprites.DROP_RATE)
+DEFAULT_HEALTH = dict(sprites.HEALTH)
+DEFAULT_THRUST = dict(sprites.THRUST)
+DEFAULT_LOOT = dict(sprites.LOOT)
+DEFAULT_WAVE_TYPES = sprites.WAVE_TYPES
+
+
+def random_tuning(rng: random.Random, spread: float) -> Tuning:
+    """Return tuning values scaled randomly by up to ``spread`` either way."""
+    def scale() -> float:
+        return rng.uniform(1 - spread, 1 + spread)
+    default = Tuning()
+    return Tuning(scale(), scale(), max(1, round(default.player_health * scale())), scale(), scale(),
+                  max(0, round(default.base_enemies * scale())), scale(), scale(),
+                  round(rng.uniform(-spread, spread) * WAVE_OFFSET_SPREAD))
+
+
+def loot_weight(p_type: sprites.PowerUpType, tuning: Tuning) -> float:
+    if p_type in sprites.BETTER_POWERUPS:
+        return tuning.better_loot
+    if p_type in sprites.BEST_POWERUPS:
+        return tuning.best_loot
+    return 1.0
+
+
+def apply_tuning(tuning: Tuning):
+    """Write the tuning values into the ``sprites`` tables. Only done in worker processes."""
+    for type_, rate in DEFAULT_DROP_RATE.items():
+        sprites.DROP_RATE[type_] = min(1.0, rate * tuning.drop_rate)
+    for shape, health in DEFAULT_HEALTH.items():
+        if shape is ObjectShape.PLAYER:
+            sprites.HEALTH[shape] = tuning.player_health
+        elif shape not in UNTUNED_SHAPES:
+            sprites.HEALTH[shape] = max(1, round(health * tuning.enemy_health))
+    for shape, thrust in DEFAULT_THRUST.items():
+        if shape is ObjectShape.PLAYER:
+            sprites.THRUST[shape] = thrust * tuning.player_thrust
+        elif shape not in UNTUNED_SHAPES:
+            sprites.THRUST[shape] = thrust * tuning.enemy_thrust
+    # Loot tables stay tuples, since the shield powerups are added to them with +=.
+    for type_, loot in DEFAULT_LOOT.items():
+        sprites.LOOT[type_] = tuple(p_type for p_type in loot
+                                    for _ in range(max(1, round(LOOT_COPIES * loot_weight(p_type, tuning)))))
+    sprites.WAVE_TYPES = tuple((max(0, last_wave + tuning.wave_offset), types)
+                               for last_wave, types in DEFAULT_WAVE_TYPES)
+
+
+def play_game(game: int, seed: int, tuning: Tuning, max_waves: int = MAX_WAVES) -> list[tuple]:
+    """Play one headless game with the autopilot and return a result row for each wave."""
+    apply_tuning(tuning)
+    random.seed(seed)
+    clock = utils.SimClock()
+    utils.set_clock(clock.get_ticks)
+    # Nothing is drawn, so the particle images are never made.
+    world = World(utils.ImageCache(lambda item: pg.Surface((1, 1))))
+    world.base_enemies = tuning.base_enemies
+    sounds = utils.Sounds(SOUND_DIRECTORY, True)
+    view = pg.Surface(WINDOWED_RESOLUTION)
+    quality = sprites.QUALITY_LEVELS[0]
+    controller = NearestEnemyController()
+    player = world.player
+    dt = 1 / TICK_RATE
+
+    rows = []
+    world.restart()
+    while world.wave <= max_waves:
+        wave = world.wave
+        wave_ticks = 0
+        damage = 0.0
+        powerups = player.powerups_collected
+        start = time.perf_counter()
+        outcome = TIMED_OUT
+        while wave_ticks < MAX_WAVE_TIME * TICK_RATE:
+            player.angle, thrusting = controller.control(WorldView(world, player))
+            player.thrusting = thrusting and not player.dead
+            health = player.health
+            camera = pg.Vector2(view.size) / 2 - player.pos
+            world.update(dt, sounds, view, camera, False, quality)
+            clock.advance(dt)
+            wave_ticks += 1
+            damage += max(0.0, health - player.health)
+            if world.wave != wave:
+                outcome = CLEARED
+                break
+            if world.death_timer > DEATH_DELAY:
+                outcome = DIED
+                break
+        seconds = time.perf_counter() - start
+        rows.append((game, seed, *tuning, wave, outcome, wave_ticks / TICK_RATE, damage,
+                     player.powerups_collected - powerups, wave_ticks / seconds if seconds else 0.0))
+        if outcome != CLEARED:
+            break
+    utils.set_clock()
+    return rows
+
+
+def _play_game(args: tuple) -> list[tuple]:
+    return play_game(*args)
+
+
+def run(games: int, seed: int = 0, spread: float = 0.25, workers: Optional[int] = None,
+        max_waves: int = MAX_WAVES) -> dict[str, np.ndarray]:
+    """Play ``games`` games in a process pool and return the result columns."""
+    rng = random.Random(seed)
+    jobs = [(game, rng.getrandbits(63), random_tuning(rng, spread), max_waves) for game in range(games)]
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    with ProcessPoolExecutor(workers) as executor:
+        for game_rows in executor.map(_play_game, jobs, chunksize=max(1, games // (workers * 8))):
+            rows.extend(game_rows)
+    return {name: np.array([row[i] for row in rows], dtype) for i, (name, dtype) in enumerate(COLUMNS.items())}
+
+
+def print_summary(columns: dict[str, np.ndarray], seconds: float):
+    games = len(np.unique(columns["game"]))
+    sim_seconds = columns["survival_time"].sum()
+    print(f"{games} GAMES, {len(columns['wave'])} WAVES IN {seconds:.1f} S "
+          f"({sim_seconds * TICK_RATE / seconds:.0f} TICKS/S OVER ALL WORKERS)")
+    for wave in np.unique(columns["wave"]):
+        rows = columns["wave"] == wave
+        cleared = (columns["outcome"][rows] == CLEARED).mean()
+        print(f"WAVE {wave:>2}: {rows.sum():>6} PLAYED, {cleared:6.1%} CLEARED, "
+              f"{columns['survival_time'][rows].mean():6.1f} S, {columns['damage_taken'][rows].mean():5.2f} DAMAGE, "
+              f"{columns['powerups_collected'][rows].mean():5.2f} POWERUPS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"{GAME_TITLE} Monte Carlo balance runner.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the game seeds and tuning values.")
+    parser.add_argument("--spread", type=float, default=0.25, help="How far the tuning values are scaled either way.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes. Defaults to the core count.")
+    parser.add_argument("--max-waves", type=int, default=MAX_WAVES)
+    parser.add_argument("--output", default="balance.npz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    columns = run(args.games, args.seed, args.spread, args.workers, args.max_waves)
+    np.savez_compressed(args.output, **columns)
+    print_summary(columns, time.perf_counter() - start)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# This file holds the frame capture that saves screenshots and recordings on a background thread.
+#
+# Frames are copied into a small pool of reusable surfaces on the main thread, which is only a memory copy, and
+# a worker thread does the slow part of encoding and writing them. If the worker falls behind while recording and
+# the pool runs out, frames are dropped and counted instead of stalling the game. PNGs are encoded with zlib instead
+# of pg.image.save, which holds the GIL for the whole encode and would stall the main thread anyway.
+import queue
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional
+
+import pygame as pg
+
+POOL_SIZE = 8
+
+PNG_COMPRESSION = 6
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def save_png(surface: pg.Surface, path: Path, compression: int = PNG_COMPRESSION):
+    """Save the surface as an RGB PNG image. zlib releases the GIL while it compresses each row, so the main thread
+    keeps running."""
+    width, height = surface.size
+    stride = width * 3
+    pixels = pg.image.tobytes(surface, "RGB")
+    compressor = zlib.compressobj(compression)
+    # Each row starts with its filter type, which is 0 for none.
+    data = [compressor.compress(b"\x00" + pixels[y * stride:(y + 1) * stride]) for y in range(height)]
+    data.append(compressor.flush())
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", header) + png_chunk(b"IDAT", b"".join(data)) +
+                     png_chunk(b"IEND", b""))
+
+
+class FrameCapture:
+    def __init__(self, pool_size: int = POOL_SIZE):
+        self.pool_size = pool_size
+        # Surfaces that are free to copy a frame into, and the copied frames waiting to be written.
+        self.free_buffers: queue.Queue[pg.Surface] = queue.Queue()
+        self.buffer_count = 0
+        # Each job is a frame, the path to write it to and whether the frame goes back to the pool afterwards. A job
+        # without a frame closes the raw files of a finished recording, and None stops the worker. The queue is
+        # unbounded so putting a job never blocks. Recorded frames are bounded by the pool, and screenshots by the
+        # player pressing the key.
+        self.jobs: queue.Queue[Optional[tuple[Optional[pg.Surface], Path, bool]]] = queue.Queue()
+        self.recording_folder: Optional[Path] = None
+        self.raw = False
+        self.frame_number = 0
+        self.dropped = 0
+        self.raw_files: dict[Path, object] = {}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @property
+    def recording(self) -> bool:
+        return self.recording_folder is not None
+
+    def get_buffer(self, size: tuple[int, int]) -> Optional[pg.Surface]:
+        """Return a free surface of the given size from the pool, or None if they are all in use."""
+        try:
+            buffer = self.free_buffers.get_nowait()
+        except queue.Empty:
+            if self.buffer_count >= self.pool_size:
+                return None
+            self.buffer_count += 1
+            buffer = None
+        # The screen size changed since the buffer was made.
+        if buffer is None or buffer.size != size:
+            buffer = pg.Surface(size)
+        return buffer
+
+    def screenshot(self, surface: pg.Surface, path: Path):
+        """Save a copy of the surface as an image. Screenshots are never dropped."""
+        buffer = self.get_buffer(surface.size)
+        if buffer is None:
+            # Make a one-off copy instead. It isn't returned to the pool.
+            self.jobs.put((surface.copy(), path, False))
+            return
+        buffer.blit(surface, (0, 0))
+        self.jobs.put((buffer, path, True))
+
+    def start_recording(self, folder: Path, raw: bool = False):
+        """Start saving every captured frame to the folder, as numbered PNG images or one raw RGB file per size."""
+        self.stop_recording()
+        folder.mkdir(parents=True, exist_ok=True)
+        self.recording_folder = folder
+        self.raw = raw
+        self.frame_number = 0
+        self.dropped = 0
+
+    def stop_recording(self):
+        if self.recording_folder is not None and self.raw:
+            self.jobs.put((None, self.recording_folder, False))
+        self.recording_folder = None
+
+    def capture_frame(self, surface: pg.Surface):
+        """Record the surface if recording. Call once per frame with the finished frame."""
+        if self.recording_folder is None:
+            return
+        buffer = self.get_buffer(surface.size)
+        if buffer is None:
+            self.dropped += 1
+            return
+        buffer.blit(surface, (0, 0))
+        if self.raw:
+            width, height = surface.size
+            path = self.recording_folder / f"frames_{width}x{height}.rgb"
+        else:
+            path = self.recording_folder / f"frame_{self.frame_number:06}.png"
+        self.jobs.put((buffer, path, True))
+        self.frame_number += 1
+
+    def run(self):
+        while (job := self.jobs.get()) is not None:
+            buffer, path, pooled = job
+            if buffer is None:
+                for file in self.raw_files.values():
+                    file.close()  # noqa
+                self.raw_files = {}
+            elif path.suffix == ".rgb":
+                if path not in self.raw_files:
+                    self.raw_files[path] = path.open("ab")
+                self.raw_files[path].write(pg.image.tobytes(buffer, "RGB"))  # noqa
+            else:
+                save_png(buffer, path)
+            if pooled:
+                self.free_buffers.put(buffer)
+        for file in self.raw_files.values():
+            file.close()  # noqa
+
+    def close(self):
+        """Write the frames that are still waiting and stop the worker thread."""
+        self.stop_recording()
+        self.jobs.put(None)
+        self.thread.join()
@@ -0,0 +1,217 @@
+# This file holds the contact solver that bounces overlapping game objects off each other.
+#
+# Contacts are solved as one stage after every object has moved. All the overlapping pairs of the frame are found
+# first, then the separation and the velocity exchange are worked out for all the pairs at once with NumPy, over a
+# fixed number of relaxation iterations. Every pair is treated the same way, so the result doesn't depend on the order
+# of the objects. Bounce damage and sounds are applied per pair afterwards. A handful of objects is solved the same way
+# in plain Python, since building the arrays costs more than the solve itself.
+from collections import Counter
+from typing import Sequence
+
+import numpy as np
+import pygame as pg
+
+import utils
+import sprites
+from sprites import ObjectType, GameObject
+
+CONTACT_ITERATIONS = 4
+# Up to this many objects, every pair is compared at once instead of sweeping.
+ALL_PAIRS_LIMIT = 128
+# Up to this many objects, contacts are solved in plain Python instead of with NumPy.
+PLAIN_PYTHON_LIMIT = 16
+
+
+def can_collide(a: GameObject, b: GameObject) -> bool:
+    """Return whether the two objects bounce off each other when they overlap."""
+    # Powerups are picked up instead, in their own update.
+    if a.type is ObjectType.POWER_UP or b.type is ObjectType.POWER_UP:
+        return False
+    # Player and player drones don't collide.
+    if a.type in sprites.PLAYER_FACTION and b.type in sprites.PLAYER_FACTION:
+        return False
+    # Enemy drones don't collide with enemies.
+    if ((a.type is ObjectType.ENEMY_DRONE or b.type is ObjectType.ENEMY_DRONE) and
+            a.type in sprites.ENEMY_FACTION and b.type in sprites.ENEMY_FACTION):
+        return False
+    # Don't collide with a dead or phasing player.
+    for go in (a, b):
+        if go.type is ObjectType.PLAYER and (go.dead or (go.phase and go.thrusting)):  # noqa
+            return False
+    return True
+
+
+def find_contacts(pos: np.ndarray, radius: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the indices of the two objects of every overlapping pair.
+
+    Small groups compare every pair in one go. Otherwise the objects are sorted by x, so only neighbours that are close
+    enough on x need to be compared. Each pass compares every object with the one ``k`` places further along, until no
+    pair that far apart can touch.
+    """
+    if len(pos) <= ALL_PAIRS_LIMIT:
+        offset = pos[:, None] - pos[None]
+        touching = np.triu((offset * offset).sum(axis=2) < (radius[:, None] + radius[None]) ** 2, 1)
+        return np.nonzero(touching)
+    order = np.argsort(pos[:, 0], kind="stable")
+    pos = pos[order]
+    radius = radius[order]
+    reach = radius.max(initial=0) * 2
+    first, second = [], []
+    for k in range(1, len(pos)):
+        near = np.flatnonzero(pos[k:, 0] - pos[:-k, 0] < reach)
+        if not len(near):
+            break
+        offset = pos[near + k] - pos[near]
+        touching = near[(offset * offset).sum(axis=1) < (radius[near] + radius[near + k]) ** 2]
+        first.append(order[touching])
+        second.append(order[touching + k])
+    if not first:
+        return np.zeros(0, np.intp), np.zeros(0, np.intp)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def find_contacts_between(pos_a: np.ndarray, radius_a: np.ndarray, pos_b: np.ndarray,
+                          radius_b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the indices into the first and the second group of every overlapping pair of one object from each."""
+    offset = pos_a[:, None] - pos_b[None]
+    return np.nonzero((offset * offset).sum(axis=2) < (radius_a[:, None] + radius_b[None]) ** 2)
+
+
+def separate(pos: np.ndarray, vel: np.ndarray, radius: np.ndarray, a: np.ndarray, b: np.ndarray,
+             iterations: int = CONTACT_ITERATIONS):
+    """Push the pairs apart and exchange the velocity along the contact normal of pairs that are closing, in place.
+
+    Each iteration works out the correction of every pair from the same positions and velocities. A pair's
+    correction is divided by the contact count of whichever of its objects is in the most contacts, so an object in
+    several contacts doesn't get pushed too far. Both objects of a pair get the same correction in opposite
+    directions, so momentum is conserved.
+    """
+    contact_count = np.bincount(a, minlength=len(pos)) + np.bincount(b, minlength=len(pos))
+    share = (1 / np.maximum(contact_count[a], contact_count[b]))[:, None]
+    for _ in range(iterations):
+        offset = pos[b] - pos[a]
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        # Objects exactly on top of each other are pushed apart along x.
+        stacked = distance == 0
+        offset[stacked] = (1, 0)
+        distance[stacked] = 1
+        normal = offset / distance[:, None]
+        # Each object of a pair moves half of the overlap.
+        push = normal * (np.maximum(radius[a] + radius[b] - distance, 0) / 2)[:, None] * share
+        correction = np.zeros_like(pos)
+        np.add.at(correction, a, -push)
+        np.add.at(correction, b, push)
+        pos += correction
+        # Equal masses, so the objects swap the parts of their velocities along the normal.
+        closing = np.maximum(((vel[a] - vel[b]) * normal).sum(axis=1), 0)
+        exchange = normal * (closing[:, None] * share)
+        correction.fill(0)
+        np.add.at(correction, a, -exchange)
+        np.add.at(correction, b, exchange)
+        vel += correction
+
+
+def separate_vectors(pos: list[pg.Vector2], vel: list[pg.Vector2], radius: Sequence[float],
+                     pairs: Sequence[tuple[int, int]], iterations: int = CONTACT_ITERATIONS):
+    """Like ``separate``, but in plain Python on lists of vectors. The vectors are replaced, not changed in place."""
+    contact_count = Counter(i for pair in pairs for i in pair)
+    shares = [1 / max(contact_count[i], contact_count[j]) for i, j in pairs]
+    for _ in range(iterations):
+        normals = []
+        correction = [pg.Vector2() for _ in pos]
+        for (i, j), share in zip(pairs, shares):
+            offset = pos[j] - pos[i]
+            distance = offset.length()
+            # Objects exactly on top of each other are pushed apart along x.
+            if distance == 0:
+                offset, distance = pg.Vector2(1, 0), 1
+            normal = offset / distance
+            normals.append(normal)
+            push = normal * (max(radius[i] + radius[j] - distance, 0) / 2 * share)
+            correction[i] -= push
+            correction[j] += push
+        for i, c in enumerate(correction):
+            pos[i] = pos[i] + c
+        correction = [pg.Vector2() for _ in vel]
+        for (i, j), share, normal in zip(pairs, shares, normals):
+            exchange = normal * (max((vel[i] - vel[j]).dot(normal), 0) * share)
+            correction[i] -= exchange
+            correction[j] += exchange
+        for i, c in enumerate(correction):
+            vel[i] = vel[i] + c
+
+
+def hit(go: GameObject, ticks: int):
+    """Take bounce damage if i-frames allow. Shields take the hit first."""
+    if ticks - go.last_hit >= sprites.BOUNCE_I_FRAMES:
+        go.shield_bypass = False
+        go.last_hit = ticks
+        if go.shield > 0:
+            go.shield -= 1
+        else:
+            go.health -= sprites.BOUNCE_DAMAGE
+
+
+def solve_contacts(objects: Sequence[GameObject], sounds: utils.Sounds, iterations: int = CONTACT_ITERATIONS):
+    """Bounce all the overlapping objects off each other and apply the bounce damage."""
+    if len(objects) < 2:
+        return
+    if len(objects) <= PLAIN_PYTHON_LIMIT:
+        solve_small(objects, sounds, iterations)
+        return
+    pos = np.array([(go.pos.x, go.pos.y) for go in objects])
+    radius = np.array([go.radius for go in objects], np.float64)
+    if len(objects) <= ALL_PAIRS_LIMIT:
+        a, b = find_contacts(pos, radius)
+    else:
+        # Only compare the groups that can collide: the player's side with the enemy side, and the enemies other than
+        # enemy drones with each other. Large drone swarms never get compared with themselves.
+        types = [go.type for go in objects]
+        friendly = np.flatnonzero([type_ in sprites.PLAYER_FACTION for type_ in types])
+        hostile = np.flatnonzero([type_ in sprites.ENEMY_FACTION for type_ in types])
+        enemies = np.flatnonzero([type_ in sprites.ENEMY_MARKERS for type_ in types])
+        a1, b1 = find_contacts_between(pos[friendly], radius[friendly], pos[hostile], radius[hostile])
+        a2, b2 = find_contacts(pos[enemies], radius[enemies])
+        a = np.concatenate((friendly[a1], enemies[a2]))
+        b = np.concatenate((hostile[b1], enemies[b2]))
+    pairs = [(i, j) for i, j in zip(a.tolist(), b.tolist()) if can_collide(objects[i], objects[j])]
+    if not pairs:
+        return
+    a, b = np.array(pairs).T
+    vel = np.array([(go.vel.x, go.vel.y) for go in objects])
+    separate(pos, vel, radius, a, b, iterations)
+
+    for i in np.union1d(a, b).tolist():
+        objects[i].pos = pg.Vector2(pos[i].tolist())
+        objects[i].vel = pg.Vector2(vel[i].tolist())
+
+    apply_hits(objects, pairs, sounds)
+
+
+def solve_small(objects: Sequence[GameObject], sounds: utils.Sounds, iterations: int = CONTACT_ITERATIONS):
+    """``solve_contacts`` in plain Python, comparing every pair."""
+    pairs = [(i, j) for i, first in enumerate(objects) for j in range(i + 1, len(objects))
+             if first.pos.distance_squared_to(objects[j].pos) < (first.radius + objects[j].radius) ** 2 and
+             can_collide(first, objects[j])]
+    if not pairs:
+        return
+    pos = [go.pos for go in objects]
+    vel = [go.vel for go in objects]
+    separate_vectors(pos, vel, [go.radius for go in objects], pairs, iterations)
+    for i in {i for pair in pairs for i in pair}:
+        objects[i].pos = pos[i]
+        objects[i].vel = vel[i]
+    apply_hits(objects, pairs, sounds)
+
+
+def apply_hits(objects: Sequence[GameObject], pairs: Sequence[tuple[int, int]], sounds: utils.Sounds):
+    """Apply the bounce damage and play the hit sounds of the touching pairs."""
+    ticks = utils.get_ticks()
+    for i, j in pairs:
+        first, second = objects[i], objects[j]
+        hit(first, ticks)
+        hit(second, ticks)
+        # Play sound if player.
+        player = first if first.type is ObjectType.PLAYER else second
+        if player.type is ObjectType.PLAYER:
+            sounds.play(sprites.SHIELD_HIT_SOUND if player.shield > 0 else sprites.PLAYER_HIT_SOUND)
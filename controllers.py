@@ -0,0 +1,190 @@
+# This file holds the controllers that fly the player ship.
+#
+# Each tick a controller gets a read-only view of the world and returns the aim angle and whether to thrust. The
+# mouse controller is used when playing, and the others let benchmarks, soak tests and the balance runner play the
+# game without a person.
+import random
+from functools import cached_property
+from typing import NamedTuple, Optional
+
+import pygame as pg
+
+import utils
+import sprites
+from sprites import ObjectType
+from world import World
+
+LEFT_MOUSE_BUTTON = 1
+
+# The autopilot lets go of thrust when an enemy is closer than this, and turns back when this close to the edge.
+AUTOPILOT_SAFE_DISTANCE = 250
+AUTOPILOT_EDGE_DISTANCE = 200
+# The autopilot dodges things that will come within this distance of the ship in the next this many seconds.
+EVADE_MARGIN = 20
+EVADE_TIME = 0.5
+# The random controller keeps each input for this many ms.
+RANDOM_HOLD_TIME = (200, 1000)
+
+
+class ObjectView(NamedTuple):
+    type: ObjectType
+    pos: pg.Vector2
+    vel: pg.Vector2
+    radius: float
+    health: float
+
+
+class BulletView(NamedTuple):
+    pos: pg.Vector2
+    vel: pg.Vector2
+    radius: float
+    # Whether the bullet was fired by an enemy.
+    hostile: bool
+
+
+class WorldView:
+    """A read-only view of the world from one player's ship. Everything it returns is a copy."""
+    def __init__(self, world: World, player: sprites.Player):
+        self._world = world
+        self._player = player
+        self.pos = pg.Vector2(player.pos)
+        self.vel = pg.Vector2(player.vel)
+        self.angle = player.angle
+        self.radius = player.radius
+        self.health = player.health
+        self.dead = player.dead
+        self.arena_radius = world.arena_radius
+        self.wave = world.wave
+
+    @cached_property
+    def objects(self) -> tuple[ObjectView, ...]:
+        """Every game object apart from the player's own ship."""
+        return tuple(ObjectView(go.type, pg.Vector2(go.pos), pg.Vector2(go.vel), go.radius, go.health)
+                     for go in self._world.game_objects if go is not self._player)
+
+    @cached_property
+    def enemies(self) -> tuple[ObjectView, ...]:
+        return tuple(o for o in self.objects if o.type in sprites.ENEMY_FACTION)
+
+    @cached_property
+    def powerups(self) -> tuple[ObjectView, ...]:
+        return tuple(o for o in self.objects if o.type is ObjectType.POWER_UP)
+
+    @cached_property
+    def bullets(self) -> tuple[BulletView, ...]:
+        return tuple(BulletView(pg.Vector2(b.pos), pg.Vector2(b.vel), b.radius,
+                                b.owner.type not in sprites.PLAYER_FACTION)
+                     for b in self._world.bullets)
+
+
+def aim_angle(offset: pg.Vector2) -> float:
+    """Return the ship angle that points along ``offset``."""
+    return pg.Vector2().angle_to(offset) + 90
+
+
+class Controller:
+    def handle_event(self, event: pg.Event):
+        """Called with every event while the game is running."""
+        pass
+
+    def control(self, view: WorldView) -> tuple[float, bool]:
+        """Return the aim angle in degrees and whether to thrust."""
+        raise NotImplementedError
+
+    def late_aim(self) -> Optional[float]:
+        """Return a fresh aim angle right before the frame is drawn, or None to keep the one from ``control``."""
+        return None
+
+
+class MouseController(Controller):
+    """Aims at the mouse cursor and thrusts while the left mouse button is held."""
+    def __init__(self):
+        self.thrusting = False
+
+    def handle_event(self, event: pg.Event):
+        if event.type == pg.MOUSEBUTTONDOWN and event.button == LEFT_MOUSE_BUTTON:
+            self.thrusting = True
+        if event.type == pg.MOUSEBUTTONUP and event.button == LEFT_MOUSE_BUTTON:
+            self.thrusting = False
+        if event.type == pg.WINDOWFOCUSLOST or event.type == pg.WINDOWMINIMIZED:
+            self.thrusting = False
+
+    def control(self, view: WorldView) -> tuple[float, bool]:
+        return self.late_aim(), self.thrusting
+
+    def late_aim(self) -> float:
+        # The player is always in the middle of the screen.
+        screen_middle = pg.Vector2(pg.display.get_surface().size) / 2
+        return aim_angle(pg.mouse.get_pos() - screen_middle)
+
+
+class NearestEnemyController(Controller):
+    """Shoots at the nearest enemy, leading it, and dodges anything that is about to hit the ship. Flies to the
+    nearest powerup when there are no enemies, and turns back before reaching the arena edge."""
+    def control(self, view: WorldView) -> tuple[float, bool]:
+        if view.pos.length() > view.arena_radius - AUTOPILOT_EDGE_DISTANCE:
+            return aim_angle(-view.pos), True
+        dodge = self.dodge_direction(view)
+        if dodge is not None:
+            return aim_angle(dodge), True
+        targets = view.enemies or view.powerups
+        if not targets:
+            return view.angle, False
+        target = min(targets, key=lambda o: view.pos.distance_squared_to(o.pos))
+        offset = target.pos - view.pos
+        if target.type is ObjectType.POWER_UP:
+            return aim_angle(offset), True
+        # Aim where the enemy will be when the bullet gets there.
+        lead_time = offset.length() / sprites.PLAYER_BULLET_SPEED
+        aim = offset + (target.vel - view.vel) * lead_time
+        # Keep shooting at enemies that are close, but stop flying into them.
+        closing = offset.length() < AUTOPILOT_SAFE_DISTANCE and view.vel.dot(offset) > 0
+        return aim_angle(aim), not closing
+
+    @staticmethod
+    def dodge_direction(view: WorldView) -> Optional[pg.Vector2]:
+        """Return the direction to fly to get out of the way of the soonest threat, or None if nothing is coming."""
+        soonest = EVADE_TIME
+        dodge = None
+        threats = [(o.pos, o.vel, o.radius) for o in view.enemies]
+        threats += [(b.pos, b.vel, b.radius) for b in view.bullets if b.hostile]
+        for pos, vel, radius in threats:
+            rel_pos = pos - view.pos
+            rel_vel = vel - view.vel
+            speed_squared = rel_vel.length_squared()
+            if not speed_squared:
+                continue
+            # Time of the closest approach, and where the threat will be relative to the ship then.
+            t = -rel_pos.dot(rel_vel) / speed_squared
+            if not 0 <= t < soonest:
+                continue
+            miss = rel_pos + rel_vel * t
+            if miss.length() < radius + view.radius + EVADE_MARGIN:
+                soonest = t
+                # Move away from where it passes, or sideways if it is coming straight at the ship.
+                dodge = -miss if miss.length_squared() > 1 else rel_vel.rotate(90)
+        return dodge
+
+
+class RandomController(Controller):
+    """Holds a random aim and thrust for a random time, then picks new ones."""
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.angle = 0.0
+        self.thrusting = False
+        self.next_change = 0
+
+    def control(self, view: WorldView) -> tuple[float, bool]:
+        ticks = utils.get_ticks()
+        if ticks >= self.next_change:
+            self.angle = self.rng.uniform(0, 360)
+            self.thrusting = self.rng.random() < 0.7
+            self.next_change = ticks + self.rng.randint(*RANDOM_HOLD_TIME)
+        return self.angle, self.thrusting
+
+
+CONTROLLERS = {
+    "mouse": MouseController,
+    "nearest": NearestEnemyController,
+    "random": RandomController,
+}
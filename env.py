@@ -0,0 +1,142 @@
+# This file holds the vectorized environment that steps many independent worlds in lockstep.
+#
+# It is meant for automated agents and large scale testing. Each step takes an action for every world, advances
+# them all by one tick and returns the observations as padded NumPy arrays along with the rewards, which are the
+# scores gained during the tick.
+#
+# Example:
+#     env = VectorEnv(64)
+#     obs = env.reset(range(64))
+#     obs, rewards, dones = env.step(np.zeros((64, 2)))
+import random
+from typing import Iterable, Sequence
+
+import numpy as np
+import pygame as pg
+
+import utils
+import sprites
+from sprites import ObjectType
+from world import World
+from main import SOUND_DIRECTORY, WINDOWED_RESOLUTION
+
+TICK_RATE = 60
+# A world is done once its player has been dead this long, same as the pause in the game.
+DEATH_DELAY = 2
+MAX_ENTITIES = 256
+
+# Entity type codes in the observations. Game objects use their ObjectType value.
+EMPTY = 0
+PLAYER_BULLET = len(ObjectType) + 1
+ENEMY_BULLET = len(ObjectType) + 2
+
+
+class VectorEnv:
+    """Many independent worlds stepped together.
+
+    The worlds share one simulated clock, one view surface and the muted sounds, and the observations are written
+    into arrays that are allocated once. Each world keeps its own random state, so a world plays out the same for the
+    same seed and actions no matter what the other worlds do. Creating an environment switches ``utils.get_ticks``
+    to the simulated clock until ``close`` is called.
+    """
+    def __init__(self, world_count: int, max_entities: int = MAX_ENTITIES):
+        self.world_count = world_count
+        self.max_entities = max_entities
+        self.clock = utils.SimClock()
+        utils.set_clock(self.clock.get_ticks)
+        # Nothing is drawn, so the particle images are never made.
+        self.image_cache = utils.ImageCache(lambda item: pg.Surface((1, 1)))
+        self.sounds = utils.Sounds(SOUND_DIRECTORY, True)
+        self.view = pg.Surface(WINDOWED_RESOLUTION)
+        self.view_middle = pg.Vector2(self.view.size) / 2
+        self.quality = sprites.QUALITY_LEVELS[0]
+        self.dt = 1 / TICK_RATE
+
+        self.worlds = [World(self.image_cache) for _ in range(world_count)]
+        self.random_states = [random.getstate()] * world_count
+
+        # Observations. Entities past ``count`` are padding with the EMPTY type.
+        self.pos = np.zeros((world_count, max_entities, 2), np.float32)
+        self.vel = np.zeros((world_count, max_entities, 2), np.float32)
+        self.type = np.zeros((world_count, max_entities), np.int8)
+        self.count = np.zeros(world_count, np.int32)
+        self.rewards = np.zeros(world_count, np.float32)
+        self.dones = np.zeros(world_count, bool)
+
+    def close(self):
+        """Switch ``utils.get_ticks`` back to the pygame clock."""
+        utils.set_clock()
+
+    def reset(self, seeds: Iterable[int]) -> dict[str, np.ndarray]:
+        """Start a new game in every world, each with its own seed, and return the observations."""
+        seeds = list(seeds)
+        if len(seeds) != self.world_count:
+            raise ValueError(f"Expected {self.world_count} seeds, got {len(seeds)}.")
+        for i, seed in enumerate(seeds):
+            self.reset_world(i, seed)
+        return self.observe()
+
+    def reset_world(self, index: int, seed: int):
+        """Start a new game in one world, such as one that is done. The observations are updated on the next step."""
+        random_state = random.getstate()
+        random.seed(seed)
+        world = World(self.image_cache)
+        world.restart()
+        self.worlds[index] = world
+        self.random_states[index] = random.getstate()
+        random.setstate(random_state)
+        self.dones[index] = False
+
+    def step(self, actions: Sequence[Sequence[float]]) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """Advance every world by one tick.
+
+        ``actions`` holds the aim angle in degrees and thrust (thrusting if above 0.5) for each world. Returns the
+        observations, the score each world gained and whether each world is done. Worlds that are done are not
+        stepped until they are reset. The returned arrays are reused by the next step.
+        """
+        actions = np.asarray(actions, np.float64)
+        if actions.shape != (self.world_count, 2):
+            raise ValueError(f"Expected actions of shape {(self.world_count, 2)}, got {actions.shape}.")
+        self.rewards[:] = 0
+        random_state = random.getstate()
+        for i, (world, (angle, thrust)) in enumerate(zip(self.worlds, actions.tolist())):
+            if self.dones[i]:
+                continue
+            random.setstate(self.random_states[i])
+            player = world.player
+            player.angle = angle
+            player.thrusting = thrust > 0.5 and not player.dead
+            score = world.score
+            world.update(self.dt, self.sounds, self.view, self.view_middle - player.pos, False, self.quality)
+            self.rewards[i] = world.score - score
+            self.dones[i] = world.death_timer > DEATH_DELAY
+            self.random_states[i] = random.getstate()
+        random.setstate(random_state)
+        self.clock.advance(self.dt)
+        return self.observe(), self.rewards, self.dones
+
+    def observe(self) -> dict[str, np.ndarray]:
+        """Write the entities of every world into the observation arrays. The player is always the first entity."""
+        max_entities = self.max_entities
+        # Gather the entities of all the worlds first, so they are converted and written with one call each.
+        rows = []
+        for i, world in enumerate(self.worlds):
+            player = world.player
+            world_rows = [(player.pos.x, player.pos.y, player.vel.x, player.vel.y, ObjectType.PLAYER.value)]
+            world_rows += [(go.pos.x, go.pos.y, go.vel.x, go.vel.y, go.type.value)
+                           for go in world.game_objects if go is not player]
+            world_rows += [(b.pos.x, b.pos.y, b.vel.x, b.vel.y,
+                            PLAYER_BULLET if b.owner.type in sprites.PLAYER_FACTION else ENEMY_BULLET)  # noqa
+                           for b in world.bullets]
+            rows += world_rows[:max_entities]
+            self.count[i] = min(len(world_rows), max_entities)
+        data = np.array(rows, np.float32).reshape(-1, 5)
+        world_index = np.repeat(np.arange(self.world_count), self.count)
+        slot = np.arange(len(rows)) - np.repeat(np.cumsum(self.count) - self.count, self.count)
+        self.pos.fill(0)
+        self.vel.fill(0)
+        self.type.fill(EMPTY)
+        self.pos[world_index, slot] = data[:, 0:2]
+        self.vel[world_index, slot] = data[:, 2:4]
+        self.type[world_index, slot] = data[:, 4]
+        return {"pos": self.pos, "vel": self.vel, "type": self.type, "count": self.count}
@@ -0,0 +1,46 @@
+# This file holds the garbage collector policy that keeps long collections out of the middle of a wave.
+#
+# Every frame makes lots of short-lived vectors, tuples and particles. With the default thresholds the collector
+# regularly runs full collections while a wave is being played, which shows up as hitches. While a wave is being
+# played, young collections happen less often and full collections are put off. Full collections are done instead
+# at safe points: the pause menu, the wave clear interval and the death timer.
+import gc
+import time
+
+# Thresholds while a wave is being played.
+WAVE_THRESHOLDS = (5000, 50, 1000)
+
+
+class GCPolicy:
+    def __init__(self):
+        self.default_thresholds = gc.get_threshold()
+        self.safe = True
+        # Collector pause stats, in ms.
+        self.start_time = 0.0
+        self.last_pause = 0.0
+        self.wave_pauses = 0
+        self.max_wave_pause = 0.0
+        gc.callbacks.append(self.callback)
+
+    def freeze(self):
+        """Move everything loaded so far out of the collector's reach. Call once the startup assets are loaded."""
+        gc.collect()
+        gc.freeze()
+
+    def update(self, safe: bool):
+        """Call every frame with whether a collector pause would go unnoticed right now."""
+        if safe and not self.safe:
+            gc.set_threshold(*self.default_thresholds)
+            gc.collect()
+        elif not safe and self.safe:
+            gc.set_threshold(*WAVE_THRESHOLDS)
+        self.safe = safe
+
+    def callback(self, phase: str, info: dict):  # noqa
+        if phase == "start":
+            self.start_time = time.perf_counter()
+            return
+        self.last_pause = (time.perf_counter() - self.start_time) * 1000
+        if not self.safe:
+            self.wave_pauses += 1
+            self.max_wave_pause = max(self.max_wave_pause, self.last_pause)
@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 # -*- coding: utf8 -*-
-import random
+import argparse
+import asyncio
 import enum
 import math
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional, Sequence
 
 import pygame as pg
 
 import utils
 import sprites
-from sprites import ObjectType
+import snapshot
+from tracer import Tracer
+from minimap import Minimap
+from gc_policy import GCPolicy
+from capture import FrameCapture
+from controllers import Controller, MouseController, WorldView
+from background import Starfield
+from world import World
 
 from colors import Color
 
@@ -18,19 +28,33 @@ APPLICATION_DIRECTORY = Path(__file__, "..").resolve()
 SOUND_DIRECTORY = APPLICATION_DIRECTORY / "sounds"
 FONT_PATH = APPLICATION_DIRECTORY / "Kenney_Future_Narrow.ttf"
 
-LEFT_MOUSE_BUTTON = 1
 MIDDLE_MOUSE_BUTTON = 2
 RIGHT_MOUSE_BUTTON = 3
 
 GAME_TITLE = "POLYBOIDS"
 WINDOWED_RESOLUTION = pg.Vector2(800, 600)
 CURSOR_RADIUS = 9
+# Frame rate cap while playing (0 is uncapped) and while the pause menu is open.
 FPS_CAP = 0
+IDLE_FPS_CAP = 30
+# How long to sleep each frame while the window is unfocused or minimized.
+UNFOCUSED_SLEEP_MS = 100
+# Longest the pause menu waits for input before it is drawn again anyway, so finished background jobs still show.
+IDLE_TIMEOUT_MS = 500
+VSYNC = False
+# Frame time budget for the quality governor. Effects are scaled down when frames take longer than this.
+QUALITY_TARGET_MS = 1000 / 60
 
 MIN_ARENA_EDGE_THICKNESS = 3
 ARENA_EDGE_THICKNESS = 10
 ARENA_PULSE_MULTIPLIER = 1
 ARENA_COLOR_MULTIPLIER = 0.5
+# Draw the cached starfield instead of the nebula particles. F6 switches between them.
+STARFIELD_BACKGROUND = True
+# The world is drawn at this fraction of the screen resolution and scaled up. The HUD and menu are always drawn at
+# full resolution. F7 cycles through the render scales.
+RENDER_SCALES = (0.5, 0.75, 1.0)
+RENDER_SCALE = 1.0
 
 
 class IndicatorStatus(enum.Enum):
@@ -48,16 +72,114 @@ INDICATOR_TEXT = {
 }
 MAX_INDICATOR_SENSE = 2000
 
-
-def main() -> None:
+# Read the mouse again right before drawing, so the ship points where the cursor is at the end of a slow update.
+LATE_AIM_SAMPLING = True
+# Measure how old the input is when the frame is simulated and flipped. The distributions are shown in the debug
+# overlay and printed when the game closes.
+LATENCY_MODE = False
+
+# Show the minimap in the bottom right corner while playing. M shows and hides it.
+SHOW_MINIMAP = True
+
+# F10 starts and stops recording every frame as numbered PNG images, or as raw RGB frames if this is set.
+RECORD_RAW = False
+
+# F5 saves the game to the quick save file and F9 loads it. F8 goes back to the start of the current wave.
+QUICK_SAVE_PATH = APPLICATION_DIRECTORY / "quicksave.bin"
+
+
+def draw_background(view: pg.Surface, world: World, camera: pg.Vector2, starfield: Optional[Starfield],
+                    effects: bool, quality: sprites.QualityLevel, arena_color: float, render_scale: float):
+    """Fill the view and draw the starfield, or the nebula particles if there is no starfield."""
+    if not effects:
+        view.fill(Color.ARENA_COLOR)
+        return
+    int_color = int(arena_color)
+    color1 = Color.ARENA_COLORS[int_color % len(Color.ARENA_COLORS)]
+    color2 = Color.ARENA_COLORS[(int_color + 1) % len(Color.ARENA_COLORS)]
+    view.fill(pg.Color(color1).lerp(color2, arena_color - int_color))
+    # The lowest quality level turns both off.
+    if starfield is not None and quality.nebula_cap:
+        starfield.draw(view, camera, world.arena_radius, render_scale)
+    else:
+        world.nebula_particles.draw(view, camera, scale=render_scale)
+
+
+def draw_arena_edge(view: pg.Surface, world: World, camera: pg.Vector2, effects: bool, pulse: float,
+                    quality: sprites.QualityLevel, render_scale: float):
+    if effects:
+        color = pg.Color(Color.ARENA_EDGE).lerp(Color.BRIGHT_ARENA_EDGE, pulse)
+        thickness = int(pg.math.lerp(ARENA_EDGE_THICKNESS, MIN_ARENA_EDGE_THICKNESS, pulse))
+    else:
+        color = Color.ARENA_EDGE
+        thickness = ARENA_EDGE_THICKNESS
+    # Only the visible arc is drawn, so this doesn't get slower as the arena grows.
+    utils.draw_clipped_ring(view, color, camera * render_scale, world.arena_radius * render_scale,
+                            max(1, round(thickness * render_scale)), quality.aa_circles)
+
+
+def draw_game_objects(view: pg.Surface, screen: pg.Surface, world: World, camera: pg.Vector2,
+                      light_source: Sequence[float], quality: sprites.QualityLevel, render_scale: float,
+                      debug: bool = False) -> list[sprites.GameObject]:
+    """Draw the game objects that are on the screen and return the enemies that aren't."""
+    enemies_not_on_screen = []
+    # Powerup icons and shields are drawn from the sprite atlas in one batch, on top of the objects.
+    sprite_batch = []
+    for go in world.game_objects:
+        # Detect offscreen enemies.
+        if go.type in sprites.ENEMY_MARKERS and not go.on_screen(screen, camera):
+            enemies_not_on_screen.append(go)
+        # Draw the game object.
+        if go.should_draw(screen, camera):
+            go.draw(view, light_source, camera, quality, render_scale, sprite_batch)
+            # Draw the collision circles.
+            if debug:
+                pg.draw.circle(view, Color.CYAN, (go.pos + camera) * render_scale, go.radius * render_scale, 1)
+    view.fblits(sprite_batch, sprites.SPRITE_BLEND)  # noqa
+    return enemies_not_on_screen
+
+
+def draw_particles(view: pg.Surface, world: World, camera: pg.Vector2, render_scale: float):
+    world.debris_particles.draw(view, camera, scale=render_scale)
+    world.thrust_particles.draw(view, camera, scale=render_scale)
+    world.bullets.draw(view, camera, scale=render_scale)
+
+
+def draw_laser(view: pg.Surface, player: sprites.Player, camera: pg.Vector2, render_scale: float):
+    if player.thrusting and player.laser:
+        p1 = (player.pos + camera) * render_scale
+        p2 = p1 + utils.polar_vector(view.width, player.angle - 90)
+        pg.draw.line(view, Color.RED, p1, p2, max(1, round(9 * render_scale)))
+        pg.draw.line(view, Color.ORANGE, p1, p2, max(1, round(5 * render_scale)))
+        pg.draw.line(view, Color.WHITE, p1, p2, 1)
+
+
+def main(snapshot_path: Optional[Path] = None, controller: Optional[Controller] = None,
+         trace_path: Optional[Path] = None) -> None:
+    """Run the game until it is closed."""
+    asyncio.run(main_async(snapshot_path, controller, trace_path))
+
+
+async def main_async(snapshot_path: Optional[Path] = None, controller: Optional[Controller] = None,
+                     trace_path: Optional[Path] = None) -> None:
+    """Run the game as a coroutine that yields once per frame, so background tasks run between frames."""
     pg.init()
+    loop = asyncio.get_running_loop()
+
+    # The ship is flown with the mouse unless another controller is given, such as an autopilot.
+    if controller is None:
+        controller = MouseController()
 
     sounds = utils.Sounds(SOUND_DIRECTORY, False)
 
     utils.setup_window(GAME_TITLE, "window_icon.png")
     fullscreen = True
-    screen = utils.create_display(WINDOWED_RESOLUTION, fullscreen)
-    clock = pg.time.Clock()
+    screen = utils.create_display(WINDOWED_RESOLUTION, fullscreen, vsync=VSYNC)
+    pacer = utils.FramePacer(FPS_CAP, IDLE_FPS_CAP, UNFOCUSED_SLEEP_MS, IDLE_TIMEOUT_MS)
+    # Screenshots and recordings are written on a background thread.
+    capture = FrameCapture()
+    governor = utils.QualityGovernor(len(sprites.QUALITY_LEVELS) - 1, QUALITY_TARGET_MS)
+    quality = sprites.QUALITY_LEVELS[governor.level]
     try:
         font = pg.Font(FONT_PATH, 24)
         big_font = pg.Font(FONT_PATH, 48)
@@ -70,21 +192,17 @@ def main() -> None:
                                utils.make_circle_image(CURSOR_RADIUS, Color.WHITE, Color.BLACK, 4))
     pg.mouse.set_cursor(cursor)
 
-    arena_radius = 1000
     debug = False
     effects = True
+    starfield_background = STARFIELD_BACKGROUND
+    render_scale = RENDER_SCALE
+    # Surface the world is drawn on. It is the screen itself at full render scale.
+    view = None
     show_indicators = IndicatorStatus.EMPTY
     force_show_indicators = False
-    edge_portal = False
     paused = True
-    score = 0
-    wave = 1
-    death_timer = 0
-    wave_timer = 0
-    enemies_left = 0
     restart_game = False
-    new_wave = False
-    new_wave_image = big_font.render(f"WAVE {wave}", True, Color.WHITE)
+    new_wave_image = big_font.render("WAVE 1", True, Color.WHITE)
     show_new_wave_image = 0
 
     arena_pulse = 0
@@ -103,203 +221,196 @@ def main() -> None:
     # The center of the arena is the light source, so you can always locate it.
     light_source = (0, 0)
 
-    # Create and reference the player object.
-    game_objects = [player := sprites.Player((0, 0))]
-    # Make menu button say "PLAY" instead of "RESUME".
-    player.dead = True
-
-    # Particle groups.
+    # Particle images.
     def make_circle_image(item: tuple[int, tuple[int, int, int]]) -> pg.Surface:
         return utils.make_circle_image(item[0], item[1], Color.BLACK)
     particle_image_cache = utils.ImageCache(make_circle_image)  # noqa
-
-    thrust_particles = utils.ParticleGroup(particle_image_cache, pg.BLEND_ADD)
-    bullets = utils.ParticleGroup(particle_image_cache)
-    debris_particles = utils.ParticleGroup(particle_image_cache)
-    nebula_particles = utils.ParticleGroup(particle_image_cache, pg.BLEND_ADD)
+    # Make the particle images now instead of in the middle of a wave.
+    particle_image_cache.warm_up(sprites.particle_image_keys())
+    # Make the sprites for every render scale and pack them into the sprite atlas.
+    sprites.SPRITE_IMAGES.warm_up(sprites.sprite_image_keys(RENDER_SCALES))
+    sprites.SPRITE_IMAGES.pack()
+
+    starfield = Starfield()
+    minimap = Minimap()
+    show_minimap = SHOW_MINIMAP
+
+    # Create the game state and reference the player object.
+    world = World(particle_image_cache)
+    player = world.player
+    # Snapshot of the game at the start of the current wave.
+    checkpoint = None
+
+    # Load a saved game, such as a late wave stress test.
+    if snapshot_path is not None:
+        snapshot.load_file(world, snapshot_path)
+        checkpoint = snapshot.save(world)
+
+    # Record every game object on every frame for offline analysis.
+    tracer = Tracer(trace_path) if trace_path is not None else None
+
+    # Jobs that run while the game keeps going, such as writing the quick save.
+    background_tasks: set[asyncio.Future] = set()
+    # Quick save files are read and written on one thread, so a load waits for a save that is still being written.
+    file_executor = ThreadPoolExecutor(1)
+
+    def start_background(job):
+        """Run a coroutine or executor job in the background. A reference is kept until it is done."""
+        task = asyncio.ensure_future(job)
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    async def load_quick_save():
+        nonlocal restart_game
+        try:
+            data = await loop.run_in_executor(file_executor, QUICK_SAVE_PATH.read_bytes)
+        except FileNotFoundError:
+            return
+        # This runs between frames, so the world isn't in the middle of an update.
+        snapshot.restore(world, data)
+        restart_game = False
+
+    async def quit_game():
+        """Finish the background jobs, the captures and the trace, then close the game."""
+        if background_tasks:
+            await asyncio.wait(background_tasks)
+        capture.close()
+        if tracer is not None:
+            tracer.close()
+        if latency is not None:
+            print(latency.report())
+        pg.quit()
+        sys.exit()
+
+    latency = utils.LatencyMonitor() if LATENCY_MODE else None
+
+    # Everything loaded so far lives until the game closes, so the collector doesn't need to look at it again.
+    gc_policy = GCPolicy()
+    gc_policy.freeze()
 
     while True:
-        for event in pg.event.get():
+        # The pause menu only changes in response to input, so it isn't drawn again until an event arrives.
+        events = await pacer.get_events_async(paused)
+        if latency is not None:
+            latency.add_events(events)
+        for event in events:
             if event.type == pg.QUIT:
-                pg.quit()
-                sys.exit()
+                await quit_game()
+
+            controller.handle_event(event)
+
+            # Pause the game when the window loses focus.
+            if event.type == pg.WINDOWFOCUSLOST or event.type == pg.WINDOWMINIMIZED:
+                paused = True
+                player.thrusting = False
+                force_show_indicators = False
 
             if event.type == pg.KEYDOWN:
                 if event.key == pg.K_q:
                     if event.mod & pg.KMOD_CTRL:
-                        pg.quit()
-                        sys.exit()
+                        await quit_game()
 
                 if event.key == pg.K_ESCAPE or event.key == pg.K_SPACE:
                     paused = not paused
                     if not paused and player.dead:
                         restart_game = True
 
+                if event.key == pg.K_m:
+                    show_minimap = not show_minimap
+
                 if event.key == pg.K_F2:
-                    pg.image.save(screen, f"screenshot_{pg.time.get_ticks()}.png")
+                    capture.screenshot(screen, Path(f"screenshot_{pg.time.get_ticks()}.png"))
+
+                if event.key == pg.K_F10:
+                    if capture.recording:
+                        capture.stop_recording()
+                    else:
+                        capture.start_recording(Path(f"recording_{pg.time.get_ticks()}"), RECORD_RAW)
 
                 if event.key == pg.K_F3:
                     debug = not debug
 
                 if event.key == pg.K_F4:
                     fullscreen = not fullscreen
-                    screen = utils.create_display(WINDOWED_RESOLUTION, fullscreen)
+                    screen = utils.create_display(WINDOWED_RESOLUTION, fullscreen, vsync=VSYNC)
 
-            if event.type == pg.MOUSEBUTTONDOWN:
-                if event.button == LEFT_MOUSE_BUTTON and not player.dead:
-                    player.thrusting = True
+                if event.key == pg.K_F5:
+                    # Take the snapshot now and write it to the file on a worker thread.
+                    quick_save = snapshot.save(world)
+                    start_background(loop.run_in_executor(file_executor, QUICK_SAVE_PATH.write_bytes, quick_save))
+
+                if event.key == pg.K_F6:
+                    starfield_background = not starfield_background
+                    world.nebula_particles.clear()
+
+                if event.key == pg.K_F7:
+                    render_scale = RENDER_SCALES[(RENDER_SCALES.index(render_scale) + 1) % len(RENDER_SCALES)]
+
+                if event.key == pg.K_F8 and checkpoint is not None:
+                    snapshot.restore(world, checkpoint)
+                    restart_game = False
 
+                if event.key == pg.K_F9:
+                    start_background(load_quick_save())
+
+            if event.type == pg.MOUSEBUTTONDOWN:
                 if event.button == RIGHT_MOUSE_BUTTON:
                     force_show_indicators = True
 
                 if event.button == MIDDLE_MOUSE_BUTTON and debug:
-                    wave = 100
+                    world.wave = 100
 
             if event.type == pg.MOUSEBUTTONUP:
-                if event.button == LEFT_MOUSE_BUTTON:
-                    player.thrusting = False
-
                 if event.button == RIGHT_MOUSE_BUTTON:
                     force_show_indicators = False
 
-        # Tick the clock.
-        dt = clock.tick(FPS_CAP) / 1000
+        # Tick the clock. Background tasks run while waiting for the next frame.
+        dt = await pacer.tick_async(paused)
+
+        # Let the garbage collector do full collections only when the hitch can't be seen.
+        gc_policy.update(paused or world.wave_timer > 0 or world.all_dead)
 
         # Update the game state.
         if not paused:
+            # Scale the effects to hold the frame time budget.
+            quality = sprites.QUALITY_LEVELS[governor.update(pacer.work_ms)]
+
             # Restart the game.
             if restart_game:
                 restart_game = False
-                death_timer = 0
-                score = 0
-                wave = 1
-                new_wave_image = big_font.render(f"WAVE {wave}", True, Color.WHITE)
+                world.restart()
+
+            # Show the wave number when a new wave starts.
+            wave_started = world.new_wave
+            if wave_started:
+                new_wave_image = big_font.render(f"WAVE {world.wave}", True, Color.WHITE)
                 show_new_wave_image = pg.time.get_ticks()
-                new_wave = True
-                # Delete remaining particles.
-                thrust_particles.clear()
-                debris_particles.clear()
-                bullets.clear()
-                # Clear other objects.
-                game_objects = [player]
-                # Reset player.
-                player.health = sprites.HEALTH[player.shape]
-                player.dead = False
-                player.pos = pg.Vector2()
-                player.vel = pg.Vector2()
-                player.bullet_damage_up = 0
-                player.rapid_fire = 0
-                player.bullet_speed = 0
-                player.big_thrust = 0.0
-                player.phase = 0.0
-                player.laser = 0.0
-
-            # Set up a new wave.
-            if new_wave:
-                new_wave = False
-                arena_radius = 900 + (wave * 100)
-                for _ in range(2 + wave):
-                    pos = utils.random_vector(arena_radius, 500)
-                    shape = random.choice(sprites.RANDOM_SHAPES)
-                    t = random.choice(sprites.get_types(wave))
-                    o = None
-                    if t is ObjectType.ASTEROID:
-                        game_objects.append(o := sprites.Asteroid(pos, shape))
-                    if t is ObjectType.ORBITER:
-                        game_objects.append(o := sprites.Orbiter(pos, shape))
-                    if t is ObjectType.RUNNER:
-                        game_objects.append(o := sprites.Runner(pos, shape, player))
-                    if t is ObjectType.CHASER:
-                        game_objects.append(o := sprites.Chaser(pos, shape, player))
-                    if t is ObjectType.GUNNER:
-                        game_objects.append(o := sprites.Gunner(pos, shape, player))
-                    if o:
-                        if wave > 6 and random.random() > 0.9:
-                            o.shield = sprites.MAX_SHIELD
-                        if wave > 9 and random.random() > 0.5:
-                            o.shield = sprites.MAX_SHIELD
-
-                        if wave > 5 and random.random() > 0.25:
-                            for _ in range(random.randint(1, 5 if wave > 9 else 2)):
-                                game_objects.append(d := sprites.Drone(o))
-                                if wave > 9 and random.random() > 0.5:
-                                    d.shield = sprites.MAX_SHIELD
-
-            # Increase death timer.
-            if player.dead:
-                death_timer += dt
-                # If player has been dead for two seconds, pause the game.
-                if death_timer > 2:
-                    paused = True
 
             # Update arena pulse.
             arena_color += ARENA_COLOR_MULTIPLIER * dt
             arena_pulse += ARENA_PULSE_MULTIPLIER * dt
             pulse = pg.math.remap(-1, 1, 0, 1, math.sin(arena_pulse))
 
-            # Spawn particles.
-            if effects and nebula_particles.size < 300:
-                nebula_particles.add(sprites.NebulaParticle())
-            if player.thrusting:
-                vel_vector = utils.polar_vector(random.randint(150, 200),
-                                                player.angle + 90 + random.randint(-15, 15))
-                big = player.big_thrust > 0
-                thrust_particles.add(sprites.ThrustParticle(player.thrust_pos, player.vel + vel_vector, big))
-
-            # Update game objects.
-            game_objects = [go for go in game_objects if go.update(dt, arena_radius, game_objects, sounds,
-                                                                   d=debris_particles, p=player, s=screen,
-                                                                   c=camera,  # noqa
-                                                                   b=bullets, e=edge_portal)]
-            # Count remaining enemies.
-            enemies_left = len([go for go in game_objects if go.type in sprites.ENEMY_MARKERS])
-
-            # Increase wave timer.
-            if not enemies_left and not player.dead:
-                wave_timer += dt
-                # If player has won for two seconds, set up the next wave.
-                if wave_timer > 2:
-                    wave_timer = 0
-                    wave += 1
-                    new_wave_image = big_font.render(f"WAVE {wave}", True, Color.WHITE)
-                    show_new_wave_image = pg.time.get_ticks()
-                    new_wave = True
-                    # Delete remaining particles.
-                    thrust_particles.clear()
-                    debris_particles.clear()
-                    bullets.clear()
-                    # Reset player.
-                    player.pos = pg.Vector2()
-                    player.vel = pg.Vector2()
-                    player.acc = pg.Vector2()
-                    player.thrusting = False
-                    # Reset player drones.
-                    drone_count = 0
-                    for go in game_objects:
-                        if go.type is ObjectType.PLAYER_DRONE:
-                            drone_count += 1
-                            # Only allow player to carry 10 drones with them into the next wave.
-                            if drone_count > 10:
-                                go.health = 0
-                                go.be_silent = True
-                            go.pos = player.pos + utils.random_vector(100, 50)
-                            go.vel = (player.pos - go.pos).rotate(random.choice((90, -90)))
-                            go.vel.scale_to_length(random.randint(50, 200))
-                            go.acc = pg.Vector2()
-                            go.turn_speed = random.randint(-100, 100)
-                        # Delete all the leftover powerups.
-                        if go.type is ObjectType.POWER_UP:
-                            go.health = 0
-
-            # Update particles.
-            if effects:
-                nebula_particles.update(dt, arena_radius=arena_radius)
-            thrust_particles.update(dt)
-            debris_particles.update(dt)
-            # Update bullets and add scoring.
-            scores = []
-            bullets.update(dt, arena_radius=arena_radius, game_objects=game_objects, sounds=sounds, scores=scores)
-            score += sum(scores)
+            # Let the controller aim the player and decide whether to thrust.
+            player.angle, thrusting = controller.control(WorldView(world, player))
+            player.thrusting = thrusting and not player.dead
+            if latency is not None:
+                latency.aimed()
+
+            # Update game objects and particles.
+            # The nebula particles are only needed when the starfield isn't drawn.
+            world.update(dt, sounds, screen, camera, effects and not starfield_background, quality)  # noqa
+            if latency is not None:
+                latency.simulated()
+            if tracer is not None:
+                tracer.record(world)
+            # Save a checkpoint once the new wave has spawned.
+            if wave_started:
+                checkpoint = snapshot.save(world)
+
+            # If player has been dead for two seconds, pause the game.
+            if world.death_timer > 2:
+                paused = True
         # Update the menu.
         else:
             # Update the buttons.
@@ -316,73 +427,71 @@ def main() -> None:
             if color_button.update():
                 effects = not effects
             if edge_button.update():
-                edge_portal = not edge_portal
+                world.edge_portal = not world.edge_portal
             if fullscreen_button.update():
                 fullscreen = not fullscreen
-                screen = utils.create_display(WINDOWED_RESOLUTION, fullscreen)
+                screen = utils.create_display(WINDOWED_RESOLUTION, fullscreen, vsync=VSYNC)
             if quit_button.update():
-                pg.quit()
-                sys.exit()
+                await quit_game()
 
         # Update the camera.
         screen_middle = pg.Vector2(screen.size) / 2
         camera = screen_middle - player.pos
 
-        # Rotate the player to face the mouse.
-        if not paused:
-            player.angle = pg.Vector2().angle_to(pg.mouse.get_pos() - screen_middle) + 90
+        # Don't render while the window can't be seen.
+        if not pacer.visible:
+            # The input was never shown, so it doesn't count.
+            if latency is not None:
+                latency.input_times.clear()
+            continue
+
+        # Aim with the newest mouse position. Only the drawing sees it until the next update.
+        if LATE_AIM_SAMPLING and not paused and not player.dead:
+            # Pumping updates the mouse position and leaves the events in the queue for the next frame.
+            pg.event.pump()
+            angle = controller.late_aim()
+            if angle is not None:
+                player.angle = angle
+                if latency is not None:
+                    latency.aimed()
 
         # Draw everything.
 
-        # Fill the screen.
-        if effects:
-            int_color = int(arena_color)
-            color1 = Color.ARENA_COLORS[int_color % len(Color.ARENA_COLORS)]
-            color2 = Color.ARENA_COLORS[(int_color + 1) % len(Color.ARENA_COLORS)]
-            screen.fill(pg.Color(color1).lerp(color2, arena_color - int_color))
-            # Draw the nebula particles.
-            nebula_particles.draw(screen, camera)
+        # Set up the surface to draw the world on.
+        # The world is scaled around the middle of the screen, so mouse aiming still lines up with it.
+        if render_scale == 1:
+            view = screen
         else:
-            screen.fill(Color.ARENA_COLOR)
+            view_size = (round(screen.width * render_scale), round(screen.height * render_scale))
+            if view is None or view is screen or view.size != view_size:
+                view = pg.Surface(view_size).convert()
+
+        # Fill the screen.
+        draw_background(view, world, camera, starfield if starfield_background else None, effects, quality,
+                        arena_color, render_scale)
 
         # Draw the arena boundary.
-        if effects:
-            color = pg.Color(Color.ARENA_EDGE).lerp(Color.BRIGHT_ARENA_EDGE, pulse)
-            thickness = int(pg.math.lerp(ARENA_EDGE_THICKNESS, MIN_ARENA_EDGE_THICKNESS, pulse))
-            pg.draw.aacircle(screen, color, camera, arena_radius, thickness)
-        else:
-            pg.draw.aacircle(screen, Color.ARENA_EDGE, camera, arena_radius, ARENA_EDGE_THICKNESS)
+        draw_arena_edge(view, world, camera, effects, pulse, quality, render_scale)
 
         # Draw the game objects.
-        enemies_not_on_screen = []
-        for go in game_objects:
-            # Detect offscreen enemies.
-            if go.type in sprites.ENEMY_MARKERS and not go.on_screen(screen, camera):
-                enemies_not_on_screen.append(go)
-            # Draw the game object.
-            if go.should_draw(screen, camera):
-                go.draw(screen, light_source, camera)
-                # Draw the collision circles.
-                if debug:
-                    pg.draw.circle(screen, Color.CYAN, go.pos + camera, go.radius, 1)
+        enemies_not_on_screen = draw_game_objects(view, screen, world, camera, light_source, quality, render_scale,
+                                                  debug)
 
         # Draw the particles.
-        debris_particles.draw(screen, camera)
-        thrust_particles.draw(screen, camera)
-        bullets.draw(screen, camera)
+        draw_particles(view, world, camera, render_scale)
 
         # Draw the laser.
-        if player.thrusting and player.laser:
-            p2 = utils.polar_vector(screen.width, player.angle - 90)
-            pg.draw.line(screen, Color.RED, player.pos + camera, player.pos + camera + p2, 9)
-            pg.draw.line(screen, Color.ORANGE, player.pos + camera, player.pos + camera + p2, 5)
-            pg.draw.line(screen, Color.WHITE, player.pos + camera, player.pos + camera + p2, 1)
+        draw_laser(view, player, camera, render_scale)
+
+        # Scale the world up to the screen.
+        if view is not screen:
+            pg.transform.scale(view, screen.size, screen)
 
         # Draw offscreen enemy indicators.
         # Indicators are triangles that point towards the enemy.
         # This essentially creates a minimap for the player to locate the remaining enemies.
         # It also provides useful info like whether the enemy is approaching and how fast it is going.
-        screen_empty = len(enemies_not_on_screen) == enemies_left
+        screen_empty = len(enemies_not_on_screen) == world.enemies_left
         if not player.dead and ((show_indicators is not IndicatorStatus.NEVER) or force_show_indicators):
             # Show the indicators if they should always be shown or if there are no enemies on screen.
             if show_indicators is IndicatorStatus.ALWAYS or screen_empty or force_show_indicators:
@@ -417,6 +526,11 @@ def main() -> None:
                     # Draw the enemy indicator.
                     pg.draw.polygon(screen, color, (v1 + draw_vec, draw_vec, v2 + draw_vec), width)
 
+        # Draw the minimap.
+        if show_minimap and not paused:
+            minimap.update(world, pg.time.get_ticks())
+            minimap.draw(screen, world.players)
+
         # Draw player damage flash.
         flash_hp = False
         if (pg.time.get_ticks() - player.last_hit < sprites.DAMAGE_FLASH_MS and
@@ -427,7 +541,7 @@ def main() -> None:
             screen.blit(flash_surf, (0, 0), special_flags=pg.BLEND_ADD)
 
         # Draw wave clear image.
-        if not paused and wave_timer > 0:
+        if not paused and world.wave_timer > 0:
             screen.blit(wave_clear_surf, wave_clear_surf.get_rect(centerx=screen.get_rect().centerx, y=150))
 
         # Draw new wave image.
@@ -435,36 +549,37 @@ def main() -> None:
             screen.blit(new_wave_image, new_wave_image.get_rect(centerx=screen.get_rect().centerx, y=150))
 
         # Draw HUD.
-        score_surf = font.render(f"SCORE: {int(score)}", True, Color.WHITE)
+        score_surf = font.render(f"SCORE: {int(world.score)}", True, Color.WHITE)
         screen.blit(score_surf, score_surf.get_rect(centerx=screen.get_rect().centerx, top=25))
 
-        wave_surf = font.render(f"WAVE {wave}", True, Color.WHITE)
+        wave_surf = font.render(f"WAVE {world.wave}", True, Color.WHITE)
         screen.blit(wave_surf, wave_surf.get_rect(centerx=screen.get_rect().centerx))
 
-        plural = "S" if enemies_left != 1 else ""
-        plural2 = "S" if enemies_left == 1 else ""
-        wave_surf = font.render(f"{enemies_left} POLYBOID{plural} REMAIN{plural2}", True, Color.WHITE)
+        plural = "S" if world.enemies_left != 1 else ""
+        plural2 = "S" if world.enemies_left == 1 else ""
+        wave_surf = font.render(f"{world.enemies_left} POLYBOID{plural} REMAIN{plural2}", True, Color.WHITE)
         screen.blit(wave_surf, wave_surf.get_rect(right=screen.width))
 
         # Draw ship health.
         hp_surf = font.render("SHIP", True, Color.WHITE)
         screen.blit(hp_surf, (0, 0))
         hp_color = Color.GREEN
+        hp_blits = []
         for i in range(player.health):
             if i >= 15:
                 hp_color = Color.CYAN
             if i >= 30:
                 hp_color = Color.WHITE
-            points = [pg.Vector2((hp_surf.width + 10) + ((i % 15) * 15), hp_surf.height / 2) + p
-                      for p in sprites.HP_POLYGON]
-            pg.draw.polygon(screen, Color.RED if flash_hp else hp_color, points)
+            sprites.draw_sprite(screen, ("HP", Color.RED if flash_hp else hp_color),
+                                ((hp_surf.width + 10) + ((i % 15) * 15), hp_surf.height / 2), hp_blits)
+        screen.fblits(hp_blits, sprites.SPRITE_BLEND)  # noqa
 
         # Draw menu buttons.
         if paused:
             screen.blit(title_text_surf, title_text_surf.get_rect(centerx=screen.get_rect().centerx, y=50))
             resume_button.draw(screen, font, " (SPACE) PLAY" if player.dead else " (SPACE) RESUME")
             sounds_button.draw(screen, font, f" SOUNDS: {"OFF" if sounds.muted else "ON"}")
-            edge_button.draw(screen, font, f"ARENA EDGE: {"PORTAL" if edge_portal else "BOUNCE"}")
+            edge_button.draw(screen, font, f"ARENA EDGE: {"PORTAL" if world.edge_portal else "BOUNCE"}")
             indicator_button.draw(screen, font, f"{INDICATOR_LINE}\n{INDICATOR_TEXT[show_indicators]}")
             color_button.draw(screen, font, f" ARENA EFFECTS: {"ON" if effects else "OFF"}")
             fullscreen_button.draw(screen, font, f" (F4) FULLSCREEN: {"ON" if fullscreen else "OFF"}")
@@ -475,16 +590,34 @@ def main() -> None:
             screen.blit(help_surf, help_surf.get_rect(centerx=screen.get_rect().centerx, bottom=screen.height))
 
         if debug:
-            fps_surf = font.render(f"F3 TO HIDE\n{nebula_particles.size}\n{clock.get_fps():.2f}",
+            fps_surf = font.render(f"F3 TO HIDE\n{world.nebula_particles.size}\n"
+                                   f"LOD: {" / ".join(str(count) for count in world.lod_counts)}\n"
+                                   f"QUALITY: {governor.level} ({governor.average_ms:.1f} MS)\n"
+                                   f"RENDER SCALE: {render_scale:.0%}\n"
+                                   f"GC: {gc_policy.wave_pauses} IN WAVE, MAX {gc_policy.max_wave_pause:.1f} MS, "
+                                   f"LAST {gc_policy.last_pause:.1f} MS\n"
+                                   f"{f"RECORDING: {capture.frame_number} ({capture.dropped} DROPPED)\n"
+                                      if capture.recording else ""}"
+                                   f"{f"{latency.report()}\n" if latency is not None else ""}"
+                                   f"{pacer.get_fps():.2f}",
                                    True, Color.WHITE)
             screen.blit(fps_surf, (0, screen.height - fps_surf.height))
 
+        capture.capture_frame(screen)
+        # The flip can block until vsync, so it isn't counted as work by the quality governor.
+        pacer.end_work()
         pg.display.flip()
+        if latency is not None:
+            latency.flipped()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=GAME_TITLE)
+    parser.add_argument("snapshot", nargs="?", type=Path, help="Snapshot file to start the game from.")
+    parser.add_argument("--trace", type=Path, help="Folder to record an entity trace of every frame into.")
+    args = parser.parse_args()
     try:
-        main()
+        main(args.snapshot, trace_path=args.trace)
     except Exception as ex:
         print(ex)
         input("Press Enter to continue...")
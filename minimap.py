@@ -0,0 +1,87 @@
+# This file holds the minimap that shows where everything is in the arena.
+#
+# Every game object is binned into a small grid over the arena, and each cell is coloured by the type with the most
+# objects in it and brightened by how many there are. The grid is written into a tiny surface with surfarray and scaled
+# up, so after the binning the cost doesn't depend on how many objects there are. The map is only rebuilt a few times
+# a second. The players are drawn on top every frame.
+from typing import Sequence
+
+import numpy as np
+import pygame as pg
+
+import sprites
+from sprites import ObjectType
+from world import World
+
+from colors import Color
+
+MINIMAP_SIZE = 160
+MINIMAP_BINS = 40
+MINIMAP_REFRESH_MS = 100
+MINIMAP_MARGIN = 10
+# A cell is drawn at full brightness once it holds this many objects. Lone objects are drawn at the minimum brightness.
+FULL_DENSITY = 4
+MIN_BRIGHTNESS = 0.6
+BACKGROUND = (10, 10, 10)
+# Color key for the corners outside the arena.
+OUTSIDE = Color.BLACK
+# Powerups are drawn in their own colors, so they have no color in COLORS.
+COLOR_OVERRIDES = {ObjectType.POWER_UP: Color.GREEN}
+
+
+class Minimap:
+    def __init__(self, size: int = MINIMAP_SIZE, bins: int = MINIMAP_BINS, refresh_ms: int = MINIMAP_REFRESH_MS):
+        self.size = size
+        self.bins = bins
+        self.refresh_ms = refresh_ms
+        self.last_refresh = None
+        self.arena_radius = 1
+        self.types = list(ObjectType)
+        self.type_index = {type_: i for i, type_ in enumerate(self.types)}
+        self.palette = np.array([COLOR_OVERRIDES.get(type_, sprites.COLORS[type_]) for type_ in self.types],
+                                np.float32)
+        # Cells with their center inside the arena. The grid spans the arena's diameter, so this never changes.
+        centers = (np.arange(bins) + 0.5) / bins * 2 - 1
+        self.inside = centers[:, None] ** 2 + centers[None] ** 2 <= 1
+        self.grid = pg.Surface((bins, bins))
+        self.image = pg.Surface((size, size))
+        self.image.set_colorkey(OUTSIDE)
+        self.image.fill(OUTSIDE)
+
+    def update(self, world: World, ticks: int):
+        """Rebuild the map if it is due for a refresh."""
+        if self.last_refresh is not None and ticks - self.last_refresh < self.refresh_ms:
+            return
+        self.last_refresh = ticks
+        self.refresh(world)
+
+    def refresh(self, world: World):
+        bins = self.bins
+        type_count = len(self.types)
+        self.arena_radius = world.arena_radius
+        rows = [(go.pos.x, go.pos.y, self.type_index[go.type])
+                for go in world.game_objects if go.type is not ObjectType.PLAYER]
+        if rows:
+            data = np.array(rows, np.float64)
+            cells = np.clip(((data[:, :2] / self.arena_radius + 1) / 2 * bins).astype(np.intp), 0, bins - 1)
+            index = (cells[:, 0] * bins + cells[:, 1]) * type_count + data[:, 2].astype(np.intp)
+            counts = np.bincount(index, minlength=bins * bins * type_count).reshape(bins, bins, type_count)
+        else:
+            counts = np.zeros((bins, bins, type_count), np.intp)
+        total = counts.sum(axis=2)
+        brightness = np.clip(total / FULL_DENSITY, MIN_BRIGHTNESS, 1)
+        rgb = self.palette[counts.argmax(axis=2)] * brightness[..., None]
+        rgb[total == 0] = BACKGROUND
+        rgb[~self.inside] = OUTSIDE
+        pg.surfarray.blit_array(self.grid, rgb.astype(np.uint8))
+        pg.transform.scale(self.grid, self.image.size, self.image)
+        pg.draw.circle(self.image, Color.BRIGHT_ARENA_EDGE, (self.size / 2, self.size / 2), self.size / 2, 1)
+
+    def draw(self, screen: pg.Surface, players: Sequence[sprites.Player]):
+        """Draw the map in the bottom right corner, with the players where they are now."""
+        rect = self.image.get_rect(bottomright=(screen.width - MINIMAP_MARGIN, screen.height - MINIMAP_MARGIN))
+        screen.blit(self.image, rect)
+        for player in players:
+            if not player.dead:
+                pos = pg.Vector2(rect.center) + player.pos * (self.size / 2 / self.arena_radius)
+                pg.draw.circle(screen, Color.WHITE, pos, 3)
@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+# This file holds the localhost multiplayer server and client.
+#
+# The server runs the authoritative simulation for every player and sends each client delta compressed snapshots
+# over UDP. Each snapshot only holds the objects that changed since the last snapshot the client acknowledged, so
+# unchanged objects cost nothing. Bullets are sent as their spawn position, velocity and spawn tick, so they never
+# change after the first snapshot they are in. Clients render from interpolated snapshots and send back their aim
+# angle and whether they are thrusting.
+#
+# Run "network.py server", then "network.py client" once per player. "network.py harness" runs a server and two
+# headless clients in one process and reports bandwidth, latency and whether the clients agree with the server.
+import argparse
+import math
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import pygame as pg
+
+import utils
+import sprites
+from sprites import ObjectType, ObjectShape, PowerUpType
+from world import World
+from colors import Color
+from main import (APPLICATION_DIRECTORY, SOUND_DIRECTORY, FONT_PATH, GAME_TITLE, WINDOWED_RESOLUTION,
+                  ARENA_EDGE_THICKNESS)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 24680
+TICK_RATE = 60
+SNAPSHOT_RATE = 20
+# Clients render this many seconds behind the newest snapshot so they can interpolate between two of them.
+INTERPOLATION_DELAY = 0.1
+# Number of snapshots kept by the server and clients to use as delta baselines.
+HISTORY_SIZE = 64
+CLIENT_TIMEOUT = 5.0
+MAX_PACKET_SIZE = 65507
+RESTART_DELAY = 2
+
+# Packet kinds.
+JOIN = 1
+INPUT = 2
+SNAPSHOT = 3
+LEAVE = 4
+
+# Kind.
+KIND = struct.Struct("<B")
+# Kind, input sequence, client time in ms, acknowledged snapshot tick, aim angle, thrusting.
+INPUT_PACKET = struct.Struct("<BIIIfB")
+# Kind, tick, baseline tick (0 for a full snapshot), echoed client time in ms, ms the echoed input was held for,
+# net id of the client's player, wave, score, arena radius, changed object count, removed object count.
+SNAPSHOT_HEADER = struct.Struct("<BIIIHIHqiHH")
+# Net id, type (0 for bullets), shape (radius for bullets), flags, color index, extra (powerup type or player phase),
+# position, velocity, angle (spawn tick for bullets), health, shield.
+ENTITY = struct.Struct("<IBBBBBhhhhHbb")
+# Net id, whether it exploded.
+REMOVED = struct.Struct("<IB")
+
+BULLET = 0
+
+# Entity flags.
+FLASH = 1
+SHIELD_BYPASS = 2
+DEAD = 4
+THRUSTING = 8
+LASER = 16
+BIG_THRUST = 32
+
+PHASE_SCALE = 25
+
+PALETTE = tuple(dict.fromkeys((*sprites.COLORS.values(), Color.YELLOW, Color.CYAN, Color.WHITE, Color.GREEN)))
+PALETTE_INDEX = {color: i for i, color in enumerate(PALETTE)}
+
+
+def clamp_short(value: float) -> int:
+    return int(pg.math.clamp(round(value), -32768, 32767))
+
+
+def color_index(color) -> int:
+    return PALETTE_INDEX.get(tuple(color)[:3], 0)
+
+
+class RateMeter:
+    """Track a rolling per-second rate of some amount, such as bytes sent."""
+    def __init__(self, window: float = 1.0):
+        self.window = window
+        self.samples: deque[tuple[float, float]] = deque()
+        self.total = 0
+
+    def add(self, amount: float):
+        now = time.perf_counter()
+        self.samples.append((now, amount))
+        self.total += amount
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    @property
+    def rate(self) -> float:
+        now = time.perf_counter()
+        return sum(amount for t, amount in self.samples if now - t <= self.window) / self.window
+
+
+class RemoteClient:
+    def __init__(self, address: tuple[str, int], player: sprites.Player):
+        self.address = address
+        self.player = player
+        self.last_seen = time.perf_counter()
+        self.ack_tick = 0
+        self.input_sequence = -1
+        self.client_time = 0
+        self.input_received = time.perf_counter()
+        self.sent = RateMeter()
+
+
+class Server:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+        def make_circle_image(item: tuple[int, tuple[int, int, int]]) -> pg.Surface:
+            return utils.make_circle_image(item[0], item[1], Color.BLACK)
+        self.world = World(utils.ImageCache(make_circle_image))  # noqa
+        self.sounds = utils.Sounds(SOUND_DIRECTORY, True)
+        self.view = pg.Surface(WINDOWED_RESOLUTION)
+        self.quality = sprites.QUALITY_LEVELS[0]
+        self.clients: dict[tuple[str, int], RemoteClient] = {}
+        # The world always has at least one player. If nobody is using it, it is handed to the next client.
+        self.free_players: list[sprites.Player] = [self.world.player]
+
+        self.tick = 0
+        self.net_ids: dict[object, int] = {}
+        self.next_net_id = 1
+        # Spawn position and tick of each bullet, so bullets never change after they are first sent.
+        self.bullet_origins: dict[sprites.Bullet, tuple[pg.Vector2, int]] = {}
+        # Encoded objects for each recent snapshot tick.
+        self.history: dict[int, dict[int, bytes]] = {}
+        # Net ids of objects that exploded, and the tick they were removed on.
+        self.exploded: dict[int, int] = {}
+        self.received = RateMeter()
+        self.snapshot_sizes: deque[int] = deque(maxlen=SNAPSHOT_RATE)
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, client: RemoteClient, data: bytes):
+        try:
+            self.sock.sendto(data, client.address)
+        except OSError:
+            return
+        client.sent.add(len(data))
+
+    def join(self, address: tuple[str, int]):
+        if self.free_players:
+            player = self.free_players.pop()
+            if not self.world.all_dead:
+                self.world.reset_player(player)
+        else:
+            player = self.world.add_player()
+        self.clients[address] = RemoteClient(address, player)
+        # The first player starts the game.
+        if self.world.all_dead:
+            self.world.restart()
+
+    def leave(self, address: tuple[str, int]):
+        client = self.clients.pop(address)
+        player = client.player
+        player.thrusting = False
+        if len(self.world.players) > 1:
+            self.world.remove_player(player)
+        else:
+            player.dead = True
+            self.free_players.append(player)
+
+    def receive(self):
+        now = time.perf_counter()
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_PACKET_SIZE)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            self.received.add(len(data))
+            if not data:
+                continue
+            kind = data[0]
+            if kind == JOIN and address not in self.clients:
+                self.join(address)
+            elif kind == LEAVE and address in self.clients:
+                self.leave(address)
+            elif kind == INPUT and address in self.clients and len(data) == INPUT_PACKET.size:
+                _, sequence, client_time, ack_tick, angle, thrusting = INPUT_PACKET.unpack(data)
+                client = self.clients[address]
+                client.last_seen = now
+                # Ignore inputs that arrive out of order.
+                if sequence <= client.input_sequence:
+                    continue
+                client.input_sequence = sequence
+                client.client_time = client_time
+                client.input_received = now
+                if ack_tick in self.history:
+                    client.ack_tick = max(client.ack_tick, ack_tick)
+                client.player.angle = angle
+                client.player.thrusting = bool(thrusting) and not client.player.dead
+        # Drop clients that stopped sending.
+        for address in [a for a, c in self.clients.items() if now - c.last_seen > CLIENT_TIMEOUT]:
+            self.leave(address)
+
+    def encode(self, net_id: int, obj, ticks: int) -> bytes:
+        if isinstance(obj, sprites.Bullet):
+            origin, spawn_tick = self.bullet_origins[obj]
+            return ENTITY.pack(net_id, BULLET, obj.radius, 0, color_index(obj.color), 0,
+                               clamp_short(origin.x), clamp_short(origin.y),
+                               clamp_short(obj.vel.x), clamp_short(obj.vel.y), spawn_tick & 0xFFFF, 0, 0)
+        flags = FLASH if ticks - obj.last_hit < sprites.DAMAGE_FLASH_MS else 0
+        flags |= SHIELD_BYPASS if obj.shield_bypass else 0
+        extra = 0
+        if isinstance(obj, sprites.Player):
+            flags |= DEAD if obj.dead else 0
+            flags |= THRUSTING if obj.thrusting else 0
+            flags |= LASER if obj.laser else 0
+            flags |= BIG_THRUST if obj.big_thrust else 0
+            extra = int(obj.phase * PHASE_SCALE)
+        elif isinstance(obj, sprites.PowerUp):
+            extra = obj.p_type.value
+        return ENTITY.pack(net_id, obj.type.value, obj.shape.value, flags, color_index(obj.color), extra,
+                           clamp_short(obj.pos.x), clamp_short(obj.pos.y),
+                           clamp_short(obj.vel.x), clamp_short(obj.vel.y),
+                           int(obj.angle % 360 * 65536 / 360) & 0xFFFF,
+                           int(pg.math.clamp(obj.health, -128, 127)), int(pg.math.clamp(obj.shield, -128, 127)))
+
+    def snapshot(self):
+        """Encode the current state and send each client the changes since their acknowledged snapshot."""
+        ticks = utils.get_ticks()
+        objects = [*self.world.game_objects, *self.world.bullets]
+        # Hand out net ids, keeping the ids of objects that are still around.
+        net_ids = {}
+        for obj in objects:
+            net_id = self.net_ids.get(obj)
+            if net_id is None:
+                net_id = self.next_net_id
+                self.next_net_id += 1
+            net_ids[obj] = net_id
+        for obj, net_id in self.net_ids.items():
+            if obj not in net_ids and getattr(obj, "health", 1) <= 0 and not getattr(obj, "be_silent", False):
+                if obj.type is not ObjectType.POWER_UP:
+                    self.exploded[net_id] = self.tick
+        self.net_ids = net_ids
+        self.bullet_origins = {b: self.bullet_origins.get(b, (pg.Vector2(b.pos), self.tick))
+                               for b in self.world.bullets}
+        current = {net_id: self.encode(net_id, obj, ticks) for obj, net_id in net_ids.items()}
+        self.history[self.tick] = current
+        for tick in [t for t in self.history if t <= self.tick - HISTORY_SIZE]:
+            del self.history[tick]
+        for net_id in [i for i, t in self.exploded.items() if t <= self.tick - HISTORY_SIZE]:
+            del self.exploded[net_id]
+
+        now = time.perf_counter()
+        for client in self.clients.values():
+            baseline_tick = client.ack_tick if client.ack_tick in self.history else 0
+            baseline = self.history[baseline_tick] if baseline_tick else {}
+            changed = [data for net_id, data in current.items() if baseline.get(net_id) != data]
+            removed = [REMOVED.pack(net_id, self.exploded.get(net_id, 0) > baseline_tick)
+                       for net_id in baseline if net_id not in current]
+            held = int(min((now - client.input_received) * 1000, 65535))
+            header = SNAPSHOT_HEADER.pack(SNAPSHOT, self.tick, baseline_tick, client.client_time, held,
+                                          net_ids[client.player], self.world.wave, int(self.world.score),
+                                          self.world.arena_radius, len(changed), len(removed))
+            data = b"".join((header, *changed, *removed))
+            self.snapshot_sizes.append(len(data))
+            self.send(client, data)
+
+    def step(self, dt: float):
+        self.receive()
+        self.tick += 1
+        # Only simulate while someone is playing.
+        if self.clients:
+            if self.world.all_dead and self.world.death_timer > RESTART_DELAY:
+                self.world.restart()
+            camera = pg.Vector2(self.view.size) / 2 - self.world.players[0].pos
+            self.world.update(dt, self.sounds, self.view, camera, False, self.quality)
+        if self.tick % (TICK_RATE // SNAPSHOT_RATE) == 0:
+            self.snapshot()
+
+    def stats(self) -> str:
+        sent = sum(client.sent.rate for client in self.clients.values())
+        size = sum(self.snapshot_sizes) / len(self.snapshot_sizes) if self.snapshot_sizes else 0
+        return (f"TICK {self.tick}  CLIENTS {len(self.clients)}  OBJECTS {len(self.net_ids)}  "
+                f"UP {sent / 1024:.1f} KB/S  DOWN {self.received.rate / 1024:.1f} KB/S  SNAPSHOT {size:.0f} B")
+
+    def run(self, stop: Optional[threading.Event] = None, print_stats: bool = True):
+        """Run the server at a fixed tick rate until ``stop`` is set."""
+        dt = 1 / TICK_RATE
+        next_tick = time.perf_counter()
+        next_stats = next_tick + 1
+        while stop is None or not stop.is_set():
+            self.step(dt)
+            next_tick += dt
+            now = time.perf_counter()
+            if print_stats and now >= next_stats:
+                next_stats = now + 1
+                print(self.stats())
+            if next_tick > now:
+                time.sleep(next_tick - now)
+            else:
+                # Don't try to catch up after a long stall.
+                next_tick = now
+
+
+class Client:
+    """A network client that keeps the interpolated game state sent by the server. It doesn't need a window."""
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.server = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.input_sequence = 0
+        # Decoded objects for each recent snapshot tick, used as delta baselines.
+        self.states: dict[int, dict[int, tuple]] = {}
+        # Recent snapshots to interpolate between, as (tick, header, state).
+        self.snapshots: deque[tuple[int, tuple, dict[int, tuple]]] = deque(maxlen=8)
+        self.latest_tick = 0
+        self.net_id = 0
+        self.wave = 1
+        self.score = 0
+        self.arena_radius = 1000
+        # Net ids that exploded or died since the last call to pop_explosions, with their last state.
+        self.explosions: list[tuple] = []
+        # Smallest recent difference between the local clock and the server tick clock, in seconds.
+        self.clock_offsets: deque[float] = deque(maxlen=32)
+        self.received = RateMeter()
+        self.sent = RateMeter()
+        self.round_trips: deque[float] = deque(maxlen=60)
+        self.snapshot_sizes: deque[int] = deque(maxlen=SNAPSHOT_RATE)
+        self.changed_counts: deque[int] = deque(maxlen=SNAPSHOT_RATE)
+
+    def send(self, data: bytes):
+        try:
+            self.sock.sendto(data, self.server)
+        except OSError:
+            return
+        self.sent.add(len(data))
+
+    def join(self):
+        self.send(KIND.pack(JOIN))
+
+    def leave(self):
+        self.send(KIND.pack(LEAVE))
+        self.sock.close()
+
+    def send_input(self, angle: float, thrusting: bool):
+        self.input_sequence += 1
+        client_time = int(time.perf_counter() * 1000) & 0xFFFFFFFF
+        self.send(INPUT_PACKET.pack(INPUT, self.input_sequence, client_time, self.latest_tick, angle, thrusting))
+
+    def poll(self):
+        """Receive and unpack every snapshot that has arrived."""
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(MAX_PACKET_SIZE)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            self.received.add(len(data))
+            if len(data) >= SNAPSHOT_HEADER.size and data[0] == SNAPSHOT:
+                self.unpack_snapshot(data)
+
+    def unpack_snapshot(self, data: bytes):
+        header = SNAPSHOT_HEADER.unpack_from(data)
+        _, tick, baseline_tick, client_time, held, net_id, wave, score, arena_radius, changed, removed = header
+        # Ignore old snapshots and ones with a baseline we no longer have.
+        if tick <= self.latest_tick or (baseline_tick and baseline_tick not in self.states):
+            return
+        if len(data) != SNAPSHOT_HEADER.size + ENTITY.size * changed + REMOVED.size * removed:
+            return
+        state = dict(self.states[baseline_tick]) if baseline_tick else {}
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(changed):
+            entity = ENTITY.unpack_from(data, offset)
+            previous = state.get(entity[0])
+            # Players don't get removed when they die, so catch it here.
+            if previous is not None and entity[3] & DEAD and not previous[3] & DEAD:
+                self.explosions.append(entity)
+            state[entity[0]] = entity
+            offset += ENTITY.size
+        for _ in range(removed):
+            removed_id, exploded = REMOVED.unpack_from(data, offset)
+            entity = state.pop(removed_id, None)
+            if exploded and entity is not None:
+                self.explosions.append(entity)
+            offset += REMOVED.size
+
+        self.states[tick] = state
+        for old_tick in [t for t in self.states if t <= tick - HISTORY_SIZE]:
+            del self.states[old_tick]
+        self.latest_tick = tick
+        self.snapshots.append((tick, header, state))
+        self.net_id = net_id
+        self.wave, self.score, self.arena_radius = wave, score, arena_radius
+        now = time.perf_counter()
+        self.clock_offsets.append(now - tick / TICK_RATE)
+        if client_time:
+            round_trip = ((int(now * 1000) & 0xFFFFFFFF) - client_time) % 2 ** 32 - held
+            self.round_trips.append(max(round_trip, 0))
+        self.snapshot_sizes.append(len(data))
+        self.changed_counts.append(changed)
+
+    def pop_explosions(self) -> list[tuple]:
+        explosions, self.explosions = self.explosions, []
+        return explosions
+
+    def render_time(self) -> float:
+        """Return the server time in seconds that should be rendered now."""
+        if not self.clock_offsets:
+            return 0.0
+        return time.perf_counter() - min(self.clock_offsets) - INTERPOLATION_DELAY
+
+    def interpolated(self, render_time: Optional[float] = None) -> list[tuple]:
+        """Return the objects as (net id, type, shape, flags, color, extra, position, angle, health, shield), with
+        their positions and angles interpolated between the two snapshots around ``render_time``."""
+        if not self.snapshots:
+            return []
+        if render_time is None:
+            render_time = self.render_time()
+        render_tick = render_time * TICK_RATE
+        before = after = self.snapshots[-1]
+        for snapshot in self.snapshots:
+            if snapshot[0] <= render_tick:
+                before = snapshot
+            else:
+                after = snapshot
+                break
+        if before[0] > render_tick:
+            before = after
+        span = after[0] - before[0]
+        amount = pg.math.clamp((render_tick - before[0]) / span, 0, 1) if span else 1
+        objects = []
+        for net_id, entity in after[2].items():
+            type_, shape, flags, color, extra = entity[1:6]
+            pos = pg.Vector2(entity[6], entity[7])
+            angle = entity[10] * 360 / 65536
+            if type_ == BULLET:
+                # Bullets fly in a straight line from where they spawned.
+                spawn_tick = after[0] - ((after[0] - entity[10]) & 0xFFFF)
+                pos += pg.Vector2(entity[8], entity[9]) * max(render_tick - spawn_tick, 0) / TICK_RATE
+            elif net_id in before[2] and before is not after:
+                old = before[2][net_id]
+                pos = pg.Vector2(old[6], old[7]).lerp(pos, amount)
+                old_angle = old[10] * 360 / 65536
+                angle = old_angle + ((angle - old_angle + 180) % 360 - 180) * amount
+            objects.append((net_id, type_, shape, flags, color, extra, pos, angle, entity[11], entity[12]))
+        return objects
+
+    def stats(self) -> str:
+        round_trip = sum(self.round_trips) / len(self.round_trips) if self.round_trips else 0
+        size = sum(self.snapshot_sizes) / len(self.snapshot_sizes) if self.snapshot_sizes else 0
+        changed = sum(self.changed_counts) / len(self.changed_counts) if self.changed_counts else 0
+        objects = len(self.snapshots[-1][2]) if self.snapshots else 0
+        return (f"RTT: {round_trip:.1f} MS\nDOWN: {self.received.rate / 1024:.1f} KB/S\n"
+                f"UP: {self.sent.rate / 1024:.1f} KB/S\nSNAPSHOT: {size:.0f} B\n"
+                f"CHANGED: {changed:.0f} / {objects}")
+
+
+class NetBullet(utils.Particle):
+    def __init__(self, pos: pg.Vector2, radius: int, color: tuple[int, int, int]):
+        self.pos = pos
+        self.radius = radius
+        self.color = color
+
+    def draw_pos(self, image: pg.Surface) -> pg.Vector2:
+        return self.pos - (self.radius, self.radius)
+
+    def cache_lookup(self) -> tuple[int, tuple[int, int, int]]:
+        return self.radius, self.color
+
+
+def make_sprite(type_: ObjectType, shape: ObjectShape, extra: int) -> sprites.GameObject:
+    """Create a game object that is only used to draw an object sent by the server."""
+    if type_ is ObjectType.PLAYER:
+        return sprites.Player((0, 0))
+    if type_ is ObjectType.POWER_UP:
+        return sprites.PowerUp((0, 0), (0, 0), PowerUpType(extra))
+    return sprites.GameObject((0, 0), shape, type_)
+
+
+def run_client(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Open a window and play on the server."""
+    pg.init()
+    utils.setup_window(f"{GAME_TITLE} (MULTIPLAYER)", APPLICATION_DIRECTORY / "window_icon.png")
+    screen = utils.create_display(WINDOWED_RESOLUTION, False)
+    clock = pg.time.Clock()
+    try:
+        font = pg.Font(FONT_PATH, 24)
+    except Exception:
+        font = pg.Font(size=24)
+
+    def make_circle_image(item: tuple[int, tuple[int, int, int]]) -> pg.Surface:
+        return utils.make_circle_image(item[0], item[1], Color.BLACK)
+    particle_image_cache = utils.ImageCache(make_circle_image)  # noqa
+    thrust_particles = utils.ParticleGroup(particle_image_cache, pg.BLEND_ADD)
+    debris_particles = utils.BurstGroup(particle_image_cache)
+    bullets = utils.ParticleGroup(particle_image_cache)
+    quality = sprites.QUALITY_LEVELS[-1]
+    light_source = (0, 0)
+
+    client = Client(host, port)
+    client.join()
+    last_join = pg.time.get_ticks()
+    sprite_cache: dict[int, sprites.GameObject] = {}
+    thrusting = False
+    angle = 0.0
+    camera = pg.Vector2()
+
+    while True:
+        for event in pg.event.get():
+            if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
+                client.leave()
+                pg.quit()
+                return
+            if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+                thrusting = True
+            if event.type == pg.MOUSEBUTTONUP and event.button == 1:
+                thrusting = False
+        dt = clock.tick(TICK_RATE) / 1000
+
+        screen_middle = pg.Vector2(screen.size) / 2
+        angle = pg.Vector2().angle_to(pg.mouse.get_pos() - screen_middle) + 90
+        client.send_input(angle, thrusting)
+        # Keep asking to join until the server answers.
+        if not client.latest_tick and pg.time.get_ticks() - last_join >= 1000:
+            last_join = pg.time.get_ticks()
+            client.join()
+        client.poll()
+
+        objects = client.interpolated()
+        for entity in client.pop_explosions():
+            debris_particles.add(sprites.make_debris_burst((entity[6], entity[7]), PALETTE[entity[4]],
+                                                           quality.debris_count))
+        thrust_particles.update(dt)
+        debris_particles.update(dt)
+
+        # Find our player to follow with the camera.
+        for net_id, _, _, _, _, _, pos, _, _, _ in objects:
+            if net_id == client.net_id:
+                camera = screen_middle - pos
+
+        screen.fill(Color.ARENA_COLOR)
+        utils.draw_clipped_ring(screen, Color.ARENA_EDGE, camera, client.arena_radius, ARENA_EDGE_THICKNESS)
+        bullets.clear()
+        ticks = pg.time.get_ticks()
+        seen = set()
+        for net_id, type_value, shape_value, flags, color, extra, pos, obj_angle, health, shield in objects:
+            seen.add(net_id)
+            if type_value == BULLET:
+                bullets.add(NetBullet(pos, shape_value, PALETTE[color]))
+                continue
+            type_ = ObjectType(type_value)
+            go = sprite_cache.get(net_id)
+            if go is None:
+                go = sprite_cache[net_id] = make_sprite(type_, ObjectShape(shape_value), extra)
+            go.type = type_
+            go.pos = pos
+            go.angle = obj_angle
+            go.color = PALETTE[color]
+            go.health = health
+            go.shield = shield
+            go.shield_bypass = bool(flags & SHIELD_BYPASS)
+            go.last_hit = ticks if flags & FLASH else 0
+            if isinstance(go, sprites.Player):
+                go.dead = bool(flags & DEAD)
+                go.thrusting = bool(flags & THRUSTING)
+                go.laser = 1.0 if flags & LASER else 0.0
+                go.phase = extra / PHASE_SCALE
+                if go.thrusting:
+                    thrust_pos = pos + pg.Vector2(sprites.PLAYER_THRUSTER_POS).rotate(obj_angle)
+                    vel_vector = utils.polar_vector(random.randint(150, 200), obj_angle + 90 + random.randint(-15, 15))
+                    thrust_particles.add(sprites.ThrustParticle(thrust_pos, vel_vector, bool(flags & BIG_THRUST)))
+            if go.should_draw(screen, camera):
+                go.draw(screen, light_source, camera, quality)
+            if isinstance(go, sprites.Player) and go.thrusting and go.laser:
+                p2 = utils.polar_vector(screen.width, obj_angle - 90)
+                pg.draw.line(screen, Color.RED, pos + camera, pos + camera + p2, 9)
+                pg.draw.line(screen, Color.WHITE, pos + camera, pos + camera + p2, 1)
+        for net_id in [i for i in sprite_cache if i not in seen]:
+            del sprite_cache[net_id]
+        debris_particles.draw(screen, camera)
+        thrust_particles.draw(screen, camera)
+        bullets.draw(screen, camera)
+
+        hud_surf = font.render(f"SCORE: {client.score}\nWAVE {client.wave}\n{client.stats()}", True, Color.WHITE)
+        screen.blit(hud_surf, (0, 0))
+        if not client.latest_tick:
+            wait_surf = font.render(f"CONNECTING TO {host}:{port}...", True, Color.WHITE)
+            screen.blit(wait_surf, wait_surf.get_rect(center=screen_middle))
+        pg.display.flip()
+
+
+def run_harness(seconds: float = 10, client_count: int = 2, port: int = 0):
+    """Run a server and headless clients on localhost, then report bandwidth, latency and state agreement."""
+    server = Server(DEFAULT_HOST, port)
+    stop = threading.Event()
+    thread = threading.Thread(target=server.run, args=(stop, False), daemon=True)
+    thread.start()
+    clients = [Client(*server.address) for _ in range(client_count)]
+    for client in clients:
+        client.join()
+
+    start = time.perf_counter()
+    next_stats = start + 1
+    frame = 0
+    while time.perf_counter() - start < seconds:
+        frame += 1
+        elapsed = time.perf_counter() - start
+        for i, client in enumerate(clients):
+            client.poll()
+            client.interpolated()
+            # Each client sweeps its aim around and thrusts in bursts.
+            angle = (elapsed * 90 + i * 180) % 360
+            client.send_input(angle, math.sin(elapsed * 2 + i) > 0)
+        if time.perf_counter() >= next_stats:
+            next_stats += 1
+            print(server.stats())
+            for i, client in enumerate(clients):
+                print(f"  CLIENT {i}: " + client.stats().replace("\n", "  "))
+        time.sleep(1 / TICK_RATE)
+
+    # Check that each client rebuilt exactly what the server sent for the last tick it received.
+    results = []
+    for i, client in enumerate(clients):
+        client.poll()
+        tick = client.latest_tick
+        expected = server.history.get(tick)
+        state = client.states.get(tick, {})
+        matches = expected is not None and {k: ENTITY.pack(*v) for k, v in state.items()} == expected
+        results.append(matches)
+        print(f"CLIENT {i}: {client.received.total / 1024:.1f} KB RECEIVED, {client.sent.total / 1024:.1f} KB SENT, "
+              f"TICK {tick}, STATE MATCHES SERVER: {matches}")
+    for client in clients:
+        client.leave()
+    time.sleep(0.1)
+    stop.set()
+    thread.join()
+    server.close()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"{GAME_TITLE} localhost multiplayer.")
+    parser.add_argument("mode", choices=("server", "client", "harness"))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seconds", type=float, default=10, help="How long the harness runs for.")
+    args = parser.parse_args()
+
+    if args.mode == "client":
+        run_client(args.host, args.port)
+        return
+    # The server and harness don't open a window.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pg.init()
+    if args.mode == "server":
+        server = Server(args.host, args.port)
+        print(f"Serving on {server.address[0]}:{server.address[1]}")
+        server.run()
+    else:
+        sys.exit(0 if run_harness(args.seconds) else 1)
+
+
+if __name__ == '__main__':
+    main()
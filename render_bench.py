@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# This file holds the headless render benchmark.
+#
+# It plays fixed, seeded scenes with the nearest enemy autopilot and then renders them with the SDL dummy video driver
+# into offscreen surfaces at several resolutions, with the arena effects on and off. It reports the ms per draw phase,
+# and compares a checksum of the pixels of every render with the golden checksums in render_golden.json, so a rendering
+# optimization can be checked for both speed and visual equivalence. Renders that don't match are saved as images.
+# After an intended visual change, run it with --update-golden and commit the new checksums. The golden renders are
+# also saved as images in golden/ to compare against locally. Checksums are only comparable between runs with the same
+# pygame-ce and SDL versions.
+#
+# Example: "render_bench.py --frames 50"
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, NamedTuple
+
+import pygame as pg
+
+import utils
+import sprites
+from controllers import NearestEnemyController, WorldView
+from background import Starfield
+from world import World
+from main import (APPLICATION_DIRECTORY, SOUND_DIRECTORY, draw_background, draw_arena_edge, draw_game_objects,
+                  draw_particles, draw_laser)
+
+from colors import Color
+
+TICK_RATE = 60
+RESOLUTIONS = ((640, 360), (1280, 720), (1920, 1080))
+GOLDEN_PATH = APPLICATION_DIRECTORY / "render_golden.json"
+GOLDEN_IMAGE_DIRECTORY = APPLICATION_DIRECTORY / "golden"
+OUTPUT_DIRECTORY = APPLICATION_DIRECTORY / "render_bench_output"
+# The arena color and edge pulse are frozen at these values.
+ARENA_COLOR = 2.5
+PULSE = 0.5
+LIGHT_SOURCE = (0, 0)
+
+
+class Scene(NamedTuple):
+    name: str
+    seed: int
+    wave: int
+    # Ticks played before the scene is rendered, so there are bullets and particles in flight.
+    warm_up_ticks: int
+    laser: bool = False
+
+
+SCENES = (
+    Scene("wave_1", 1, 1, 120),
+    Scene("wave_10", 10, 10, 240),
+    Scene("wave_25_laser", 25, 25, 240, True),
+)
+PHASES = ("BACKGROUND", "ARENA EDGE", "GAME OBJECTS", "PARTICLES", "LASER")
+
+
+def build_scene(scene: Scene, image_cache: utils.ImageCache) -> World:
+    """Play the scene's wave from its seed for the warm up ticks. The simulated clock is left where it stopped."""
+    random.seed(scene.seed)
+    clock = utils.SimClock()
+    utils.set_clock(clock.get_ticks)
+    world = World(image_cache)
+    sounds = utils.Sounds(SOUND_DIRECTORY, True)
+    view = pg.Surface(RESOLUTIONS[0])
+    quality = sprites.QUALITY_LEVELS[-1]
+    controller = NearestEnemyController()
+    player = world.player
+    world.restart()
+    world.wave = scene.wave
+    for _ in range(scene.warm_up_ticks):
+        player.angle, thrusting = controller.control(WorldView(world, player))
+        player.thrusting = thrusting and not player.dead
+        camera = pg.Vector2(view.size) / 2 - player.pos
+        world.update(1 / TICK_RATE, sounds, view, camera, False, quality)
+        clock.advance(1 / TICK_RATE)
+    if scene.laser:
+        player.laser = 10.0
+        player.thrusting = not player.dead
+    return world
+
+
+def render(screen: pg.Surface, world: World, starfield: Starfield, effects: bool) -> list[tuple[str, Callable]]:
+    """Return the draw phases of one frame, in order, as (name, function) pairs."""
+    camera = pg.Vector2(screen.size) / 2 - world.player.pos
+    quality = sprites.QUALITY_LEVELS[-1]
+    return [
+        ("BACKGROUND", lambda: draw_background(screen, world, camera, starfield, effects, quality, ARENA_COLOR, 1)),
+        ("ARENA EDGE", lambda: draw_arena_edge(screen, world, camera, effects, PULSE, quality, 1)),
+        ("GAME OBJECTS", lambda: draw_game_objects(screen, screen, world, camera, LIGHT_SOURCE, quality, 1)),
+        ("PARTICLES", lambda: draw_particles(screen, world, camera, 1)),
+        ("LASER", lambda: draw_laser(screen, world.player, camera, 1)),
+    ]
+
+
+def checksum(surface: pg.Surface) -> str:
+    return hashlib.sha256(pg.image.tobytes(surface, "RGB")).hexdigest()[:16]
+
+
+def run(frames: int, update_golden: bool = False) -> bool:
+    """Render every scene and print the timings. Return whether every render matched its golden checksum."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pg.init()
+    # A display is needed to convert images to its pixel format, the same as in the game.
+    pg.display.set_mode((1, 1))
+
+    def make_circle_image(item: tuple[int, tuple[int, int, int]]) -> pg.Surface:
+        return utils.make_circle_image(item[0], item[1], Color.BLACK)
+    image_cache = utils.ImageCache(make_circle_image)  # noqa
+    image_cache.warm_up(sprites.particle_image_keys())
+    sprites.SPRITE_IMAGES.warm_up(sprites.sprite_image_keys())
+    sprites.SPRITE_IMAGES.pack()
+    starfield = Starfield()
+
+    golden = json.loads(GOLDEN_PATH.read_text()) if GOLDEN_PATH.exists() and not update_golden else {}
+    checksums = {}
+    all_match = True
+    print(f"{"SCENE":<14}{"RESOLUTION":>11}{"EFFECTS":>9}"
+          f"{"".join(f"{phase:>14}" for phase in PHASES)}{"TOTAL":>9}  RESULT")
+    for scene in SCENES:
+        world = build_scene(scene, image_cache)
+        for width, height in RESOLUTIONS:
+            for effects in (True, False):
+                key = f"{scene.name} {width}x{height} {"effects" if effects else "plain"}"
+                screen = pg.Surface((width, height)).convert()
+                phases = render(screen, world, starfield, effects)
+                totals = dict.fromkeys(PHASES, 0.0)
+                for _ in range(frames):
+                    for name, draw in phases:
+                        start = time.perf_counter()
+                        draw()
+                        totals[name] += time.perf_counter() - start
+                ms = [totals[phase] * 1000 / frames for phase in PHASES]
+                checksums[key] = checksum(screen)
+                file_name = f"{key.replace(" ", "_")}.png"
+                if update_golden:
+                    GOLDEN_IMAGE_DIRECTORY.mkdir(exist_ok=True)
+                    pg.image.save(screen, GOLDEN_IMAGE_DIRECTORY / file_name)
+                    result = "SAVED"
+                elif key not in golden:
+                    result = "NO GOLDEN"
+                    all_match = False
+                elif golden[key] == checksums[key]:
+                    result = "OK"
+                else:
+                    OUTPUT_DIRECTORY.mkdir(exist_ok=True)
+                    pg.image.save(screen, OUTPUT_DIRECTORY / file_name)
+                    result = "MISMATCH"
+                    all_match = False
+                print(f"{scene.name:<14}{f"{width}x{height}":>11}{"ON" if effects else "OFF":>9}"
+                      f"{"".join(f"{value:>14.3f}" for value in ms)}{sum(ms):>9.3f}  {result}")
+    utils.set_clock()
+    if update_golden:
+        GOLDEN_PATH.write_text(json.dumps(checksums, indent=4) + "\n")
+        print(f"Golden checksums saved to {GOLDEN_PATH.name}")
+    elif not all_match:
+        print(f"Renders that don't match their golden checksum are saved to {OUTPUT_DIRECTORY.name}")
+    return all_match
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless render benchmark with golden checksums.")
+    parser.add_argument("--frames", type=int, default=20, help="Frames rendered per scene, resolution and effects.")
+    parser.add_argument("--update-golden", action="store_true", help="Save the renders as the new golden renders.")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.frames, args.update_golden) else 1)
+
+
+if __name__ == '__main__':
+    main()
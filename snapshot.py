@@ -0,0 +1,217 @@
+# This file holds functions to save and restore the game state as compact binary snapshots.
+import struct
+from pathlib import Path
+
+import pygame as pg
+
+import sprites
+import utils
+from sprites import ObjectType, ObjectShape, PowerUpType
+from world import World
+
+MAGIC = b"PBSN"
+VERSION = 2
+
+# Magic, version, wave, score, arena radius, death timer, wave timer, object count, bullet count.
+HEADER = struct.Struct("<4sHIqiffII")
+# Type, shape, flags, powerup type,
+# position, velocity, angle, turn speed, orbit target,
+# health, shield,
+# ms since last hit, ms since last fire, index of the linked object (drone owner or chase target),
+# player bullet powerups, player timed powerups, player powerups collected.
+OBJECT = struct.Struct("<4B" "8f" "2h" "3i" "3h" "3f" "I")
+# Position, velocity, index of the owner, owner type and shape for owners that were removed,
+# color, radius, damage, ms since fired.
+BULLET = struct.Struct("<4f" "i" "2B" "3B" "B" "h" "i")
+
+SHIELD_BYPASS = 1
+BE_SILENT = 2
+DRONE_BULLETS = 4
+PLAYER_DEAD = 8
+PLAYER_THRUSTING = 16
+
+NO_LINK = -1
+
+OBJECT_CLASSES = {
+    ObjectType.POWER_UP: sprites.PowerUp,
+    ObjectType.PLAYER_DRONE: sprites.Drone,
+    ObjectType.ENEMY_DRONE: sprites.Drone,
+    ObjectType.ASTEROID: sprites.Asteroid,
+    ObjectType.ORBITER: sprites.Orbiter,
+    ObjectType.RUNNER: sprites.Runner,
+    ObjectType.CHASER: sprites.Chaser,
+    ObjectType.GUNNER: sprites.Gunner,
+    ObjectType.PLAYER: sprites.Player,
+}
+
+
+def save(world: World) -> bytes:
+    """Pack the game state into a binary snapshot."""
+    ticks = utils.get_ticks()
+    objects = world.game_objects
+    bullets = list(world.bullets)
+    indices = {id(go): i for i, go in enumerate(objects)}
+    data = bytearray(HEADER.size + OBJECT.size * len(objects) + BULLET.size * len(bullets))
+    HEADER.pack_into(data, 0, MAGIC, VERSION, world.wave, int(world.score), world.arena_radius,
+                     world.death_timer, world.wave_timer, len(objects), len(bullets))
+    offset = HEADER.size
+    for go in objects:
+        flags = (SHIELD_BYPASS if go.shield_bypass else 0) | (BE_SILENT if go.be_silent else 0)
+        p_type = 0
+        turn_speed = getattr(go, "turn_speed", 0)
+        target = pg.Vector2()
+        last_fire = getattr(go, "last_fire", 0)
+        link = NO_LINK
+        powerups = (0, 0, 0, 0.0, 0.0, 0.0)
+        powerups_collected = 0
+        if isinstance(go, sprites.PowerUp):
+            p_type = go.p_type.value
+        elif isinstance(go, sprites.Orbiter):
+            target = go.target
+        elif isinstance(go, (sprites.Chaser, sprites.Runner, sprites.Gunner)):
+            link = indices.get(id(go.target), NO_LINK)
+        elif isinstance(go, sprites.Drone):
+            link = indices.get(id(go.owner), NO_LINK)
+            flags |= DRONE_BULLETS if go.bullets else 0
+        elif isinstance(go, sprites.Player):
+            flags |= (PLAYER_DEAD if go.dead else 0) | (PLAYER_THRUSTING if go.thrusting else 0)
+            powerups = (go.bullet_damage_up, go.rapid_fire, go.bullet_speed, go.big_thrust, go.phase, go.laser)
+            powerups_collected = go.powerups_collected
+        OBJECT.pack_into(data, offset, go.type.value, go.shape.value, flags, p_type,
+                         go.pos.x, go.pos.y, go.vel.x, go.vel.y, go.angle, turn_speed, target.x, target.y,
+                         go.health, go.shield,
+                         ticks - go.last_hit, ticks - last_fire, link, *powerups, powerups_collected)
+        offset += OBJECT.size
+    for bullet in bullets:
+        owner = bullet.owner
+        BULLET.pack_into(data, offset, bullet.pos.x, bullet.pos.y, bullet.vel.x, bullet.vel.y,
+                         indices.get(id(owner), NO_LINK), owner.type.value, owner.shape.value,
+                         *tuple(bullet.color)[:3], bullet.radius, bullet.damage, ticks - bullet.start_time)
+        offset += BULLET.size
+    return bytes(data)
+
+
+def restore(world: World, data: bytes):
+    """Replace the game state with the one packed in a binary snapshot.
+
+    The world's local player object is kept and updated in place, and any other players in the snapshot join as
+    new players. Raises ``ValueError`` if the data is not a snapshot.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Snapshot is truncated.")
+    (magic, version, wave, score, arena_radius, death_timer, wave_timer, count,
+     bullet_count) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a supported snapshot.")
+    bullets_offset = HEADER.size + OBJECT.size * count
+    if len(data) != bullets_offset + BULLET.size * bullet_count:
+        raise ValueError("Snapshot is truncated.")
+
+    ticks = utils.get_ticks()
+    player = world.player
+    players: list[sprites.Player] = []
+    records = list(OBJECT.iter_unpack(memoryview(data)[HEADER.size:bullets_offset]))
+    objects: list[sprites.GameObject] = []
+    # Create the objects first, then resolve the links between them.
+    for record in records:
+        type_, shape = ObjectType(record[0]), ObjectShape(record[1])
+        pos, vel = (record[4], record[5]), (record[6], record[7])
+        if type_ is ObjectType.PLAYER and not players:
+            go = player
+            go.pos, go.vel = pg.Vector2(pos), pg.Vector2(vel)
+            players.append(go)
+        else:
+            go = OBJECT_CLASSES[type_].__new__(OBJECT_CLASSES[type_])
+            sprites.GameObject.__init__(go, pos, shape, type_, vel)
+            if type_ is ObjectType.PLAYER:
+                go.thrust_pos = pg.Vector2(pos)
+                go.gun_pos = pg.Vector2(pos)
+                players.append(go)
+        objects.append(go)
+
+    for go, record in zip(objects, records):
+        (_, _, flags, p_type, _, _, _, _, angle, turn_speed, target_x, target_y, health, shield,
+         hit_age, fire_age, link, bullet_damage_up, rapid_fire, bullet_speed, big_thrust, phase, laser,
+         powerups_collected) = record
+        go.angle = angle
+        go.health = health
+        go.shield = shield
+        go.last_hit = ticks - hit_age
+        go.shield_bypass = bool(flags & SHIELD_BYPASS)
+        go.be_silent = bool(flags & BE_SILENT)
+        go.lod_dt = 0.0
+        linked = objects[link] if link != NO_LINK else player
+        if isinstance(go, sprites.Player):
+            go.acc = pg.Vector2()
+            go.last_fire = ticks - fire_age
+            go.dead = bool(flags & PLAYER_DEAD)
+            go.thrusting = bool(flags & PLAYER_THRUSTING)
+            go.bullet_damage_up = bullet_damage_up
+            go.rapid_fire = rapid_fire
+            go.bullet_speed = bullet_speed
+            go.big_thrust = big_thrust
+            go.phase = phase
+            go.laser = laser
+            go.powerups_collected = powerups_collected
+        elif isinstance(go, sprites.PowerUp):
+            go.p_type = PowerUpType(p_type)
+            go.acc = pg.Vector2()
+        elif isinstance(go, sprites.Asteroid):
+            go.turn_speed = turn_speed
+        elif isinstance(go, sprites.Orbiter):
+            go.target = pg.Vector2(target_x, target_y)
+            go.acc = pg.Vector2()
+            go.turn_speed = turn_speed
+        elif isinstance(go, (sprites.Chaser, sprites.Runner)):
+            go.acc = pg.Vector2()
+            go.target = linked
+        elif isinstance(go, sprites.Gunner):
+            go.acc = pg.Vector2()
+            go.target = linked
+            go.last_fire = ticks - fire_age
+        elif isinstance(go, sprites.Drone):
+            go.acc = pg.Vector2()
+            go.turn_speed = turn_speed
+            go.last_fire = ticks - fire_age
+            go.bullets = bool(flags & DRONE_BULLETS)
+            go.owner = linked
+            # An enemy drone whose owner was already removed would have been converted on its next update.
+            if link == NO_LINK and go.type is ObjectType.ENEMY_DRONE:
+                go.type = ObjectType.PLAYER_DRONE
+            go.color = sprites.COLORS[ObjectType.PLAYER if go.bullets else go.type]
+    # Make sure the local player is always in the game.
+    if player not in objects:
+        objects.insert(0, player)
+        players.insert(0, player)
+
+    world.game_objects = objects
+    world.players = players
+    world.wave = wave
+    world.score = score
+    world.arena_radius = arena_radius
+    world.death_timer = death_timer
+    world.wave_timer = wave_timer
+    world.new_wave = False
+    world.enemies_left = len([go for go in objects if go.type in sprites.ENEMY_MARKERS])
+    world.clear_particles()
+    for record in BULLET.iter_unpack(memoryview(data)[bullets_offset:]):
+        x, y, vel_x, vel_y, link, owner_type, owner_shape, red, green, blue, radius, damage, age = record
+        if link != NO_LINK:
+            owner = objects[link]
+        else:
+            # The owner was removed after firing. The bullet only needs its faction, so it gets a stand-in.
+            owner = sprites.GameObject((x, y), ObjectShape(owner_shape), ObjectType(owner_type))
+        bullet = sprites.Bullet((x, y), (vel_x, vel_y), owner, player, ((red, green, blue), radius, damage))
+        bullet.start_time = ticks - age
+        bullet.end_time = bullet.start_time + bullet.life_time
+        world.bullets.add(bullet)
+
+
+def save_file(world: World, path: str | Path):
+    """Save a binary snapshot of the game state to a file."""
+    Path(path).write_bytes(save(world))
+
+
+def load_file(world: World, path: str | Path):
+    """Restore the game state from a binary snapshot file."""
+    restore(world, Path(path).read_bytes())
@@ -1,14 +1,16 @@
 # This file holds game objects.
 
+import math
 import random
 import enum
+from array import array
 
 import pygame as pg
 
 import utils
 from colors import Color
 
-from typing import Sequence, Hashable
+from typing import Sequence, Hashable, Iterable, NamedTuple, Optional
 
 EQUILATERAL_TRIANGLE_HEIGHT_FACTOR = 0.866
 
@@ -87,6 +89,8 @@ PLAYER_BULLET_RADIUS = 5
 PLAYER_BULLET_SPEED = 500
 PLAYER_FIRE_RATE = 500
 DRONE_FIRE_RATE = 1000
+# Most drones a player can carry into the next wave. None for no limit.
+DRONE_SWARM_CAP = 10
 PLAYER_BULLET_DAMAGE = 1
 
 ENEMY_BULLET_RADIUS = 5
@@ -108,10 +112,45 @@ RAPIDFIRE_RADIUS = 3
 MAX_SHIELD = 10
 SHIELD_BONUS = 2
 
+DEBRIS_SPEED = (60, 120)
+DEBRIS_RADIUS = (2, 4)
+DEBRIS_LIFE_TIME = (350, 500)
+THRUST_PARTICLE_RADIUS = (3, 5)
+NEBULA_PARTICLE_RADIUS = (1, 3)
+
 LASER_DAMAGE = 1
 BOUNCE_DAMAGE = 1
 BOUNCE_I_FRAMES = 250
 DAMAGE_FLASH_MS = 250
+# Colors of the ship health pips in the HUD, and the color they flash when the ship is hit.
+HP_COLORS = (Color.GREEN, Color.CYAN, Color.WHITE, Color.RED)
+# Sprites are drawn onto transparent images, so their anti-aliased edges come out with premultiplied alpha.
+SPRITE_BLEND = pg.BLEND_PREMULTIPLIED
+
+# Simulation level of detail bands as (distance from player, update interval in seconds).
+# Objects further away than a band's distance are only updated once per interval, using the accumulated dt.
+# Objects that are on screen always get updated every frame.
+LOD_BANDS = (
+    (1500, 1 / 30),
+    (3000, 1 / 15),
+    (5000, 1 / 10),
+)
+
+
+class QualityLevel(NamedTuple):
+    nebula_cap: int
+    debris_count: int
+    aa_outlines: bool
+    aa_circles: bool
+
+
+# Effect quality levels from lowest to highest. The quality governor steps between them to hold the frame budget.
+QUALITY_LEVELS = (
+    QualityLevel(0, 10, False, False),
+    QualityLevel(100, 20, False, False),
+    QualityLevel(200, 30, True, False),
+    QualityLevel(300, 40, True, True),
+)
 
 ASTEROID_HIT_SOUND = "explosion.wav"
 PLAYER_HIT_SOUND = "player_hit.wav"
@@ -159,16 +198,21 @@ class ObjectType(enum.Enum):
     PLAYER = enum.auto()
 
 
-def get_types(wave: int) -> Sequence[ObjectType]:
+# The enemy types of the waves up to each wave, in order. Later waves have all of them.
+WAVE_TYPES = (
     # First two waves have only basic enemies.
-    if wave <= 2:
-        return ObjectType.ASTEROID, ObjectType.ORBITER
+    (2, (ObjectType.ASTEROID, ObjectType.ORBITER)),
     # Then we introduce some runners.
-    if wave <= 5:
-        return ObjectType.ASTEROID, ObjectType.ORBITER, ObjectType.RUNNER
+    (5, (ObjectType.ASTEROID, ObjectType.ORBITER, ObjectType.RUNNER)),
     # Now for some chasers.
-    if wave <= 7:
-        return ObjectType.ASTEROID, ObjectType.ORBITER, ObjectType.RUNNER, ObjectType.CHASER
+    (7, (ObjectType.ASTEROID, ObjectType.ORBITER, ObjectType.RUNNER, ObjectType.CHASER)),
+)
+
+
+def get_types(wave: int) -> Sequence[ObjectType]:
+    for last_wave, types in WAVE_TYPES:
+        if wave <= last_wave:
+            return types
     # Then all of them.
     return RANDOM_TYPES
 
@@ -338,6 +382,25 @@ def centroid(points: Sequence[Sequence[float]]) -> tuple[float, float]:
     return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
 
 
+def make_debris_burst(pos: Sequence[float], color, count: int, seed: Optional[int] = None) -> utils.Burst:
+    """Create a burst of ``count`` debris particles. The particles are generated from ``seed``, or a random seed."""
+    if seed is None:
+        seed = random.getrandbits(32)
+    rng = random.Random(seed)
+    particles = []
+    for _ in range(count):
+        vel_vector = utils.polar_vector(-rng.randint(*DEBRIS_SPEED), rng.randrange(360))
+        particles.append((vel_vector.x, vel_vector.y, rng.randint(*DEBRIS_RADIUS), rng.randint(*DEBRIS_LIFE_TIME)))
+    particles.sort(key=lambda p: p[3], reverse=True)
+    return utils.Burst(pos, utils.get_ticks(), seed, color, array("f", [v for p in particles for v in p]))
+
+
+def nearest_player(pos: pg.Vector2, players: Sequence["Player"]) -> "Player":
+    """Return the living player closest to ``pos``, or the closest player if they are all dead."""
+    living = [p for p in players if not p.dead] or players
+    return min(living, key=lambda p: pos.distance_squared_to(p.pos))
+
+
 class Button:
     def __init__(self, y_offset: int, height: int = 45):
         self.y_offset = y_offset
@@ -376,14 +439,13 @@ class ThrustParticle(utils.Particle):
     def __init__(self, pos: Sequence[float], vel: Sequence[float], big: bool = False):
         self.pos = pg.Vector2(pos)  # noqa
         self.vel = pg.Vector2(vel)  # noqa
-        self.radius = random.randint(3, 5)
-        self.start_time = pg.time.get_ticks()
+        self.radius = random.randint(*THRUST_PARTICLE_RADIUS)
+        self.start_time = utils.get_ticks()
         self.life_time = random.randint(200, 500 if big else 350)
+        self.end_time = self.start_time + self.life_time
         self.color = Color.BIG_THRUST if big else Color.THRUST
 
     def update(self, dt: float, *args, **kwargs) -> bool:
-        if pg.time.get_ticks() - self.start_time >= self.life_time:
-            return False
         self.pos += self.vel * dt
         return True
 
@@ -394,77 +456,69 @@ class ThrustParticle(utils.Particle):
         return self.radius, self.color
 
 
+def bullet_style(owner: "GameObject", player: "Player") -> tuple[tuple[int, int, int], int, int]:
+    """Return the color, radius and damage of a bullet fired by ``owner``. ``player`` is the target for enemies."""
+    if owner.type not in PLAYER_FACTION:
+        return owner.color, ENEMY_BULLET_RADIUS, ENEMY_BULLET_DAMAGE
+    color = Color.YELLOW if player.rapid_fire else player.color  # Drones also fire green bullets.
+    radius = RAPIDFIRE_RADIUS if player.rapid_fire else PLAYER_BULLET_RADIUS
+    if player.bullet_damage_up:
+        radius = BIG_BULLET_RADIUS
+        color = Color.CYAN
+    if player.bullet_speed:
+        color = Color.WHITE
+    damage = BIG_BULLET_DAMAGE if player.bullet_damage_up else PLAYER_BULLET_DAMAGE
+    return color, radius, damage
+
+
 class Bullet(utils.Particle):
-    def __init__(self, pos: Sequence[float], vel: Sequence[float], owner: "GameObject", player: "Player"):
+    def __init__(self, pos: Sequence[float], vel: Sequence[float], owner: "GameObject", player: "Player",
+                 style: Optional[tuple[tuple[int, int, int], int, int]] = None):
         self.pos = pg.Vector2(pos)  # noqa
         self.vel = pg.Vector2(vel)  # noqa
         self.owner = owner
-        self.color = owner.color
-        self.start_time = pg.time.get_ticks()
+        self.start_time = utils.get_ticks()
         self.life_time = 4000
-        if owner.type in PLAYER_FACTION:
-            self.color = Color.YELLOW if player.rapid_fire else player.color  # Drones also fire green bullets.
-            self.radius = RAPIDFIRE_RADIUS if player.rapid_fire else PLAYER_BULLET_RADIUS
-            if player.bullet_damage_up:
-                self.radius = BIG_BULLET_RADIUS
-                self.color = Color.CYAN
-            if player.bullet_speed:
-                self.color = Color.WHITE
-            self.damage = BIG_BULLET_DAMAGE if player.bullet_damage_up else PLAYER_BULLET_DAMAGE
-        else:
-            self.radius = ENEMY_BULLET_RADIUS
-            self.damage = ENEMY_BULLET_DAMAGE
+        self.end_time = self.start_time + self.life_time
+        # Bullets fired together can share one style.
+        self.color, self.radius, self.damage = style or bullet_style(owner, player)
 
     def update(self, dt: float, *args, **kwargs) -> bool:
-        if pg.time.get_ticks() - self.start_time >= self.life_time:
-            return False
         # Despawn outside of arena bounds.
         if self.pos.length_squared() > kwargs["arena_radius"] ** 2:
             return False
-        for go in kwargs["game_objects"]:
-            # Don't damage those of your faction.
-            if self.owner.type in PLAYER_FACTION and go.type in PLAYER_FACTION:
+        # Sweep the bullet along its path for this frame so fast bullets can't skip over objects.
+        end_pos = self.pos + self.vel * dt
+        reach = self.vel.length() * dt
+        hit = None
+        hit_t = 1.0
+        # Only check the objects outside of your faction.
+        targets = kwargs["player_targets"] if self.owner.type in PLAYER_FACTION else kwargs["enemy_targets"]
+        for go in targets:
+            # Skip objects that are out of reach this frame.
+            radius = go.radius + self.radius
+            if self.pos.distance_squared_to(go.pos) > (reach + radius) ** 2:
                 continue
-            if self.owner.type in ENEMY_FACTION and go.type in ENEMY_FACTION:
-                continue
-            # Collide and deal damage.
-            if self.pos.distance_squared_to(go.pos) < (go.radius + self.radius) ** 2:
-                if go.type is ObjectType.POWER_UP:
-                    go.health = 0
-                    self.owner.apply_powerup(go.p_type, kwargs["sounds"], kwargs["game_objects"])
-                    return False
-                go.health -= self.damage
-                go.shield_bypass = True
-                if go.health > 0 and go.type is not ObjectType.PLAYER_DRONE:
-                    kwargs["sounds"].play(PLAYER_HIT_SOUND if go.type is ObjectType.PLAYER else ASTEROID_HIT_SOUND)
-                if go.health <= 0 and self.owner.type in PLAYER_FACTION:
-                    bonus = SHIELD_BONUS if go.shield > 0 else 1
-                    kwargs["scores"].append(SHAPE_SCORES[go.shape] * TYPE_SCORES[go.type] * bonus)
-                go.last_hit = pg.time.get_ticks()
+            t = utils.collide_circle_segment(self.pos, end_pos, go.pos, radius)
+            if t is not None and (hit is None or t < hit_t):
+                hit, hit_t = go, t
+        # Collide with the earliest object hit and deal damage. Ties go to the first object in the list.
+        if hit is not None:
+            go = hit
+            if go.type is ObjectType.POWER_UP:
+                go.health = 0
+                self.owner.apply_powerup(go.p_type, kwargs["sounds"], kwargs["game_objects"])
                 return False
-        self.pos += self.vel * dt
-        return True
-
-    def draw_pos(self, image: pg.Surface) -> Sequence[float]:
-        return self.pos - (self.radius, self.radius)
-
-    def cache_lookup(self) -> Hashable:
-        return self.radius, self.color
-
-
-class DebrisParticle(utils.Particle):
-    def __init__(self, pos: Sequence[float], vel: Sequence[float], color):
-        self.pos = pg.Vector2(pos)  # noqa
-        self.vel = pg.Vector2(vel)  # noqa
-        self.color = color
-        self.radius = random.randint(2, 4)
-        self.start_time = pg.time.get_ticks()
-        self.life_time = random.randint(350, 500)
-
-    def update(self, dt: float, *args, **kwargs) -> bool:
-        if pg.time.get_ticks() - self.start_time >= self.life_time:
+            go.health -= self.damage
+            go.shield_bypass = True
+            if go.health > 0 and go.type is not ObjectType.PLAYER_DRONE:
+                kwargs["sounds"].play(PLAYER_HIT_SOUND if go.type is ObjectType.PLAYER else ASTEROID_HIT_SOUND)
+            if go.health <= 0 and self.owner.type in PLAYER_FACTION:
+                bonus = SHIELD_BONUS if go.shield > 0 else 1
+                kwargs["scores"].append(SHAPE_SCORES[go.shape] * TYPE_SCORES[go.type] * bonus)
+            go.last_hit = utils.get_ticks()
             return False
-        self.pos += self.vel * dt
+        self.pos = end_pos
         return True
 
     def draw_pos(self, image: pg.Surface) -> Sequence[float]:
@@ -477,7 +531,7 @@ class DebrisParticle(utils.Particle):
 class NebulaParticle(utils.Particle):
     def __init__(self):
         self.pos = pg.Vector2()
-        self.radius = random.randint(1, 3)
+        self.radius = random.randint(*NEBULA_PARTICLE_RADIUS)
         self.vel = utils.random_vector(self.radius * 500, 500)
         self.color = Color.BLACK
 
@@ -497,6 +551,126 @@ class NebulaParticle(utils.Particle):
         return self.radius, self.color
 
 
+def particle_image_keys() -> set[tuple[int, tuple[int, ...]]]:
+    """Return the (radius, color) image keys of every particle the game can make, to warm up the image cache."""
+    def radii(radius_range: tuple[int, int]) -> range:
+        return range(radius_range[0], radius_range[1] + 1)
+    object_colors = set(COLORS.values())
+    keys = {(radius, color) for radius in radii(THRUST_PARTICLE_RADIUS) for color in (Color.THRUST, Color.BIG_THRUST)}
+    keys |= {(radius, color) for radius in radii(DEBRIS_RADIUS) for color in object_colors}
+    bullet_radii = (PLAYER_BULLET_RADIUS, ENEMY_BULLET_RADIUS, RAPIDFIRE_RADIUS, BIG_BULLET_RADIUS)
+    bullet_colors = object_colors | {Color.YELLOW, Color.CYAN, Color.WHITE}
+    keys |= {(radius, color) for radius in bullet_radii for color in bullet_colors}
+    # Nebula particles fade from black to white.
+    keys |= {(radius, (v, v, v, 255)) for radius in radii(NEBULA_PARTICLE_RADIUS) for v in range(256)}
+    return keys
+
+
+def draw_powerup_icon(surface: pg.Surface, p_type: PowerUpType, center: pg.Vector2, scale: float = 1.0):
+    """Draw the icon of a powerup type, a symbol in a ring of the powerup's color."""
+    color = Color.WHITE
+    radius = max(1, round(2 * scale))
+    if p_type is PowerUpType.LASER:
+        color = Color.RED
+        p = 7 * scale
+        width = max(1, round(3 * scale))
+        p1, p2 = (-p, -p), (p, p)
+        pg.draw.line(surface, color, center + p1, center + p2, width)  # noqa
+        p1, p2 = (-p, p), (p, -p)
+        pg.draw.line(surface, color, center + p1, center + p2, width)  # noqa
+        p1, p2 = (0, -p), (0, p)
+        pg.draw.line(surface, color, center + p1, center + p2, width)  # noqa
+        p1, p2 = (-p, 0), (p, 0)
+        pg.draw.line(surface, color, center + p1, center + p2, width)  # noqa
+    if p_type is PowerUpType.HEALTH:
+        color = Color.GREEN
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in HP_POLYGON])  # noqa
+    if p_type is PowerUpType.THRUST:
+        color = Color.ORANGE
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in HP_POLYGON])  # noqa
+    if p_type is PowerUpType.PHASE:
+        color = Color.CYAN
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in HP_POLYGON])  # noqa
+    if p_type is PowerUpType.SHIELD:
+        color = Color.BLUE
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in HP_POLYGON])  # noqa
+    if p_type is PowerUpType.DRONE:
+        color = Color.CYAN
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in DRONE_POLYGON])  # noqa
+    if p_type is PowerUpType.SHIELD_DRONE:
+        color = Color.BLUE
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in DRONE_POLYGON])  # noqa
+    if p_type is PowerUpType.BULLET_DRONES:
+        color = Color.GREEN
+        pg.draw.polygon(surface, color, [center + pg.Vector2(p) * scale for p in DRONE_POLYGON])  # noqa
+    if p_type is PowerUpType.BULLET_DAMAGE:
+        color = Color.CYAN
+        pg.draw.aacircle(surface, color, center, PLAYER_BULLET_RADIUS * scale)  # noqa
+    if p_type is PowerUpType.RAPID_FIRE:
+        color = Color.YELLOW
+        pg.draw.aacircle(surface, color, center, RAPIDFIRE_RADIUS * scale)  # noqa
+    if p_type is PowerUpType.BULLET_SPEED:
+        color = Color.WHITE
+        pg.draw.aacircle(surface, color, center, PLAYER_BULLET_RADIUS * scale)  # noqa
+    pg.draw.aacircle(surface, color, center, RADII[ObjectShape.POWER_UP] * scale, radius)  # noqa
+
+
+def shield_style(shield: Optional[int]) -> tuple[pg.Color, int]:
+    """Return the color and width of a shield ring. A shield of ``None`` is the flash when the shield is hit."""
+    if shield is None:
+        return pg.Color(Color.WHITE), 4
+    return pg.Color(Color.SHIELD_EMPTY_COLOR).lerp(Color.SHIELD_FULL_COLOR, shield / MAX_SHIELD), 2
+
+
+def make_sprite_image(key: tuple) -> pg.Surface:
+    """Draw the sprite for an image key from ``sprite_image_keys`` onto a transparent image, centered on its middle
+    pixel."""
+    kind = key[0]
+    if kind == "POWER_UP":
+        _, p_type, scale = key
+        half = math.ceil(RADII[ObjectShape.POWER_UP] * scale) + 2
+    elif kind == "SHIELD":
+        _, radius, shield, scale = key
+        half = math.ceil((radius + 10) * scale) + 2
+    else:
+        half = max(max(abs(x), abs(y)) for x, y in HP_POLYGON) + 1
+    image = pg.Surface((half * 2 + 1, half * 2 + 1), pg.SRCALPHA)
+    center = pg.Vector2(half, half)
+    if kind == "POWER_UP":
+        draw_powerup_icon(image, key[1], center, key[2])
+    elif kind == "SHIELD":
+        color, width = shield_style(key[2])
+        pg.draw.aacircle(image, color, center, (key[1] + 10) * key[3], max(1, round(width * key[3])))  # noqa
+    else:
+        pg.draw.polygon(image, key[1], [center + p for p in HP_POLYGON])
+    return image
+
+
+# Sprites that used to be drawn shape by shape every frame. They are packed into one texture atlas at startup.
+SPRITE_IMAGES = utils.ImageCache(make_sprite_image)
+
+
+def sprite_image_keys(scales: Iterable[float] = (1.0,)) -> set[tuple]:
+    """Return the image keys of every sprite at the given render scales, to warm up the sprite images."""
+    keys = {("HP", color) for color in HP_COLORS}
+    for scale in scales:
+        keys |= {("POWER_UP", p_type, scale) for p_type in PowerUpType}
+        keys |= {("SHIELD", radius, shield, scale) for radius in set(RADII.values())
+                 for shield in (*range(1, MAX_SHIELD + 1), None)}
+    return keys
+
+
+def draw_sprite(screen: pg.Surface, key: tuple, center: Sequence[float], batch: Optional[list] = None):
+    """Draw a sprite centered on ``center``, or add it to ``batch`` to be drawn later with ``SPRITE_BLEND``."""
+    image = SPRITE_IMAGES.get_image(key)
+    # Truncated the same way pygame truncates the centers of shapes, so the sprites land where they were drawn.
+    pos = (int(center[0]) - image.width // 2, int(center[1]) - image.height // 2)
+    if batch is None:
+        screen.blit(image, pos, special_flags=SPRITE_BLEND)
+    else:
+        batch.append((image, pos))
+
+
 class GameObject:
     def __init__(self, pos: Sequence[float], shape: ObjectShape, type_: ObjectType, vel: Sequence[float] = (0, 0)):
         self.pos = pg.Vector2(pos)  # noqa
@@ -512,6 +686,7 @@ class GameObject:
         self.shield_bypass = False
         self.shield = 0
         self.be_silent = False
+        self.lod_dt = 0.0
 
     def apply_powerup(self, type_: PowerUpType, sounds, objects):
         # Could possibly add certain powerup abilities to enemies, but very unlikely.
@@ -523,13 +698,31 @@ class GameObject:
     def should_draw(self, screen, camera):
         return screen.get_rect().inflate(100, 100).collidepoint(self.pos + camera)
 
+    def lod_band(self, players: Sequence["Player"], screen: pg.Surface, camera: Sequence[float]) -> int:
+        """Return the index of the level of detail band this object is in. Band 0 is updated every frame."""
+        # Dying objects, the player's faction and anything visible always get full updates.
+        if self.health <= 0 or self.type in PLAYER_FACTION or self.should_draw(screen, camera):
+            return 0
+        distance = min(self.pos.distance_squared_to(player.pos) for player in players)
+        band = 0
+        for i, (band_distance, _) in enumerate(LOD_BANDS):
+            if distance > band_distance ** 2:
+                band = i + 1
+        return band
+
+    def lod_update(self, dt: float, band: int, arena_radius: int, objects, sounds, **kwargs) -> bool:
+        """Update the object if enough time has accumulated for its level of detail band."""
+        self.lod_dt += dt
+        if band and self.lod_dt < LOD_BANDS[band - 1][1]:
+            return True
+        dt, self.lod_dt = self.lod_dt, 0.0
+        return self.update(dt, arena_radius, objects, sounds, **kwargs)
+
     def update(self, dt: float, arena_radius: int, objects, sounds, **kwargs) -> bool:
         if self.health <= 0 and self.type is not ObjectType.PLAYER:
             if self.type is not ObjectType.POWER_UP:
                 if not self.be_silent:
-                    for _ in range(40):
-                        vel_vector = utils.polar_vector(-random.randint(60, 120), random.randrange(360))
-                        kwargs["d"].add(DebrisParticle(self.pos, vel_vector, self.color))
+                    kwargs["d"].add(make_debris_burst(self.pos, self.color, kwargs["q"].debris_count))
                     if self.on_screen(kwargs["s"], kwargs["c"]) or self.shield_bypass:
                         sounds.play(ASTEROID_BREAK_SOUND)
                 # Spawn powerups if not a drone.
@@ -548,80 +741,35 @@ class GameObject:
                 self.pos.scale_to_length(arena_radius)
                 self.vel = self.vel.reflect(self.pos) * ARENA_BOUNCE
         # Get hit by the laser.
-        player = kwargs["p"]
-        ticks = pg.time.get_ticks()
-        if self.type in ENEMY_FACTION and player.thrusting and player.laser:
-            p2 = utils.polar_vector(arena_radius * 2, player.angle - 90)  # The laser spans the entire arena.
-            if utils.collide_circle_line(player.pos, p2, self.pos, self.radius + 10):
-                self.shield = 0  # Lasers destroy shields.
-                if ticks - self.last_hit >= BOUNCE_I_FRAMES:
-                    self.last_hit = ticks
-                    self.shield_bypass = True  # Play break sound offscreen.
-                    self.health -= LASER_DAMAGE
-                    sounds.play(ASTEROID_HIT_SOUND)
-        # Collide with other objects.
-        for go in objects:
-            if go is self:
-                continue
-            if self.pos.distance_squared_to(go.pos) < (self.radius + go.radius) ** 2:
-                # Don't collide with powerups.
-                if go.type is ObjectType.POWER_UP:
-                    continue
-                # Apply powerups.
-                if self.type is ObjectType.POWER_UP:
-                    if go.type in PLAYER_FACTION:
-                        player.apply_powerup(self.p_type, sounds, objects)  # noqa
-                        return False
-                    continue
-                # Don't collide if phasing.
-                if self is player and self.phase and self.thrusting:  # noqa
-                    continue
-                # Player and player drones don't collide.
-                if self.type in PLAYER_FACTION and go.type in PLAYER_FACTION:
-                    continue
-                # Enemy drones don't collide with enemies.
-                if self.type is ObjectType.ENEMY_DRONE and go.type in ENEMY_FACTION:
-                    continue
-                # Enemies don't collide with enemy drones.
-                if self.type in ENEMY_FACTION and go.type is ObjectType.ENEMY_DRONE:
-                    continue
-                # Don't collide with a dead or phasing player.
-                if self.type in ENEMY_FACTION and go.type is ObjectType.PLAYER:
-                    if player.dead or (player.phase and player.thrusting):
-                        continue
-                # Decrease health if i-frames allow.
-                if ticks - self.last_hit >= BOUNCE_I_FRAMES:
-                    self.shield_bypass = False
-                    self.last_hit = ticks
-                    if self.shield > 0:
-                        self.shield -= 1
-                    else:
-                        self.health -= BOUNCE_DAMAGE
-                if ticks - go.last_hit >= BOUNCE_I_FRAMES:
-                    go.shield_bypass = False
-                    go.last_hit = ticks
-                    if go.shield > 0:
-                        go.shield -= 1
-                    else:
-                        go.health -= BOUNCE_DAMAGE
-                # Play sound if player.
-                if self is player or go is player:
-                    sounds.play(SHIELD_HIT_SOUND if player.shield > 0 else PLAYER_HIT_SOUND)
-                # Move self away so they are no longer colliding.
-                unstick_vector = self.pos - go.pos
-                unstick_vector.scale_to_length(self.radius + go.radius - self.pos.distance_to(go.pos))
-                self.pos += unstick_vector
-                # Bounce the objects.
-                tangent_vector = pg.Vector2(go.pos.y - self.pos.y, -(go.pos.x - self.pos.x)).normalize()
-                rel_vel = self.vel - go.vel
-                vel = rel_vel - tangent_vector * (rel_vel * tangent_vector)
-                self.vel -= vel
-                go.vel += vel
+        ticks = utils.get_ticks()
+        for player in kwargs["p"]:
+            if self.type in ENEMY_FACTION and player.thrusting and player.laser:
+                p2 = utils.polar_vector(arena_radius * 2, player.angle - 90)  # The laser spans the entire arena.
+                if utils.collide_circle_line(player.pos, p2, self.pos, self.radius + 10):
+                    self.shield = 0  # Lasers destroy shields.
+                    if ticks - self.last_hit >= BOUNCE_I_FRAMES:
+                        self.last_hit = ticks
+                        self.shield_bypass = True  # Play break sound offscreen.
+                        self.health -= LASER_DAMAGE
+                        sounds.play(ASTEROID_HIT_SOUND)
+        # Get picked up by the player or a player drone. Bouncing off other objects is done by the contact solver.
+        if self.type is ObjectType.POWER_UP:
+            for go in objects:
+                if go.type in PLAYER_FACTION and self.pos.distance_squared_to(go.pos) < (self.radius + go.radius) ** 2:
+                    # Apply powerups to the player or the player that owns the drone.
+                    player = go if go.type is ObjectType.PLAYER else go.owner  # noqa
+                    player.apply_powerup(self.p_type, sounds, objects)  # noqa
+                    return False
         return True
 
-    def draw(self, screen: pg.Surface, light_source: Sequence[float], camera: Sequence[float]):
+    def draw(self, screen: pg.Surface, light_source: Sequence[float], camera: Sequence[float],
+             quality: QualityLevel = QUALITY_LEVELS[-1], scale: float = 1.0, batch: Optional[list] = None):
+        """Draw the object. Screen coordinates are ``(world coordinates + camera) * scale``.
+
+        Sprites are added to ``batch`` if one is given, to be drawn together after the objects.
+        """
         # Detect if under damage flash effect.
-        flash_effect = pg.time.get_ticks() - self.last_hit < DAMAGE_FLASH_MS
+        flash_effect = utils.get_ticks() - self.last_hit < DAMAGE_FLASH_MS
         # Draw each polygon separately.
         for polygon in self.polygons:
             # Calculate the world coordinates for each point, rotating as needed.
@@ -637,7 +785,7 @@ class GameObject:
             # Calculate the lighting amount.
             lighting = pg.math.remap(-1, 1, 0.75, 0, lighting_vector * normal_vector)
             # Transform the world coordinates into screen coordinates.
-            draw_points = [point + camera for point in points]  # noqa
+            draw_points = [(point + camera) * scale for point in points]  # noqa
             # Sometimes lighting falls outside range, so we clamp it again to [0, 1].
             color = darken(self.color, pg.math.clamp(lighting, 0, 1))
             # Lighten the color for the flash animation when taking damage.
@@ -646,15 +794,20 @@ class GameObject:
             # Draw the solid face.
             pg.draw.polygon(screen, color, draw_points)
             # Draw the outline.
-            pg.draw.aalines(screen, self.color, True, draw_points)
+            if quality.aa_outlines:
+                pg.draw.aalines(screen, self.color, True, draw_points)
+            else:
+                pg.draw.lines(screen, self.color, True, draw_points)
         # Draw the shield.
         if self.shield > 0:
-            width = 2
-            color = pg.Color(Color.SHIELD_EMPTY_COLOR).lerp(Color.SHIELD_FULL_COLOR, self.shield / MAX_SHIELD)
-            if flash_effect and not self.shield_bypass:
-                width = 4
-                color = Color.WHITE
-            pg.draw.aacircle(screen, color, self.pos + camera, self.radius + 10, width)  # noqa
+            shield = None if flash_effect and not self.shield_bypass else self.shield
+            center = (self.pos + camera) * scale
+            if quality.aa_circles:
+                # Anti-aliased rings are slow to draw, so they come from the sprite atlas.
+                draw_sprite(screen, ("SHIELD", self.radius, shield, scale), center, batch)
+            else:
+                color, width = shield_style(shield)
+                pg.draw.circle(screen, color, center, (self.radius + 10) * scale, max(1, round(width * scale)))  # noqa
 
 
 class Asteroid(GameObject):
@@ -675,58 +828,16 @@ class PowerUp(GameObject):
         self.acc = pg.Vector2()
 
     def update(self, dt: float, arena_radius: int, objects, sounds, **kwargs) -> bool:
-        player_pos = kwargs["p"].pos
+        player_pos = nearest_player(self.pos, kwargs["p"]).pos
         if self.pos.distance_squared_to(player_pos) < POWERUP_SUCK_DISTANCE ** 2:
             self.acc = player_pos - self.pos  # noqa
             self.acc.scale_to_length(THRUST[self.shape])
             self.vel += self.acc * dt
         return super().update(dt, arena_radius, objects, sounds, **kwargs)
 
-    def draw(self, screen: pg.Surface, light_source: Sequence[float], camera: Sequence[float]):
-        color = Color.WHITE
-        radius = 2
-        if self.p_type is PowerUpType.LASER:
-            color = Color.RED
-            p = 7
-            p1, p2 = (-p, -p), (p, p)
-            pg.draw.line(screen, color, self.pos + camera + p1, self.pos + camera + p2, 3)  # noqa
-            p1, p2 = (-p, p), (p, -p)
-            pg.draw.line(screen, color, self.pos + camera + p1, self.pos + camera + p2, 3)  # noqa
-            p1, p2 = (0, -p), (0, p)
-            pg.draw.line(screen, color, self.pos + camera + p1, self.pos + camera + p2, 3)  # noqa
-            p1, p2 = (-p, 0), (p, 0)
-            pg.draw.line(screen, color, self.pos + camera + p1, self.pos + camera + p2, 3)  # noqa
-        if self.p_type is PowerUpType.HEALTH:
-            color = Color.GREEN
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in HP_POLYGON])  # noqa
-        if self.p_type is PowerUpType.THRUST:
-            color = Color.ORANGE
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in HP_POLYGON])  # noqa
-        if self.p_type is PowerUpType.PHASE:
-            color = Color.CYAN
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in HP_POLYGON])  # noqa
-        if self.p_type is PowerUpType.SHIELD:
-            color = Color.BLUE
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in HP_POLYGON])  # noqa
-        if self.p_type is PowerUpType.DRONE:
-            color = Color.CYAN
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in DRONE_POLYGON])  # noqa
-        if self.p_type is PowerUpType.SHIELD_DRONE:
-            color = Color.BLUE
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in DRONE_POLYGON])  # noqa
-        if self.p_type is PowerUpType.BULLET_DRONES:
-            color = Color.GREEN
-            pg.draw.polygon(screen, color, [self.pos + p + camera for p in DRONE_POLYGON])  # noqa
-        if self.p_type is PowerUpType.BULLET_DAMAGE:
-            color = Color.CYAN
-            pg.draw.aacircle(screen, color, self.pos + camera, PLAYER_BULLET_RADIUS)  # noqa
-        if self.p_type is PowerUpType.RAPID_FIRE:
-            color = Color.YELLOW
-            pg.draw.aacircle(screen, color, self.pos + camera, RAPIDFIRE_RADIUS)  # noqa
-        if self.p_type is PowerUpType.BULLET_SPEED:
-            color = Color.WHITE
-            pg.draw.aacircle(screen, color, self.pos + camera, PLAYER_BULLET_RADIUS)  # noqa
-        pg.draw.aacircle(screen, color, self.pos + camera, self.radius, radius)  # noqa
+    def draw(self, screen: pg.Surface, light_source: Sequence[float], camera: Sequence[float],
+             quality: QualityLevel = QUALITY_LEVELS[-1], scale: float = 1.0, batch: Optional[list] = None):
+        draw_sprite(screen, ("POWER_UP", self.p_type, scale), (self.pos + camera) * scale, batch)
 
 
 class Orbiter(GameObject):
@@ -795,13 +906,13 @@ class Gunner(GameObject):
             self.acc = self.pos - self.target.pos
             self.acc.scale_to_length(THRUST[self.shape])
             self.vel += self.acc * dt
-            if pg.time.get_ticks() - self.last_fire >= ENEMY_FIRE_RATE:
+            if utils.get_ticks() - self.last_fire >= ENEMY_FIRE_RATE:
                 sounds.play(ENEMY_FIRE_GUN_SOUND)
-                self.last_fire = pg.time.get_ticks()
+                self.last_fire = utils.get_ticks()
                 vel_vector = utils.polar_vector(-ENEMY_BULLET_SPEED, self.angle + 90)
                 gun_pos = self.target.pos - self.pos
                 gun_pos.scale_to_length(self.radius)
-                kwargs["b"].add(Bullet(self.pos + gun_pos, self.vel + vel_vector, self, kwargs["p"]))
+                kwargs["b"].add(Bullet(self.pos + gun_pos, self.vel + vel_vector, self, self.target))  # noqa
         else:
             self.acc = self.target.pos - self.pos
             self.acc.scale_to_length(THRUST[self.shape])
@@ -825,7 +936,7 @@ class Drone(GameObject):
     def update(self, dt: float, arena_radius: int, objects, sounds, **kwargs) -> bool:
         # Convert to player drone if enemy owner was killed.
         if self.type is ObjectType.ENEMY_DRONE and self.owner.health <= 0:
-            self.owner = kwargs["p"]
+            self.owner = nearest_player(self.pos, kwargs["p"])
             self.type = ObjectType.PLAYER_DRONE
             self.color = COLORS[self.type]
             # Reset turn speed for some visual flair.
@@ -839,14 +950,34 @@ class Drone(GameObject):
         # Fire bullets.
         if self.bullets and self.owner.thrusting and not self.owner.laser:
             fire_rate = PLAYER_FIRE_RATE if self.owner.rapid_fire else DRONE_FIRE_RATE
-            if pg.time.get_ticks() - self.last_fire >= fire_rate:
-                self.last_fire = pg.time.get_ticks()
-                speed = -BIG_BULLET_SPEED if self.owner.bullet_speed else -PLAYER_BULLET_SPEED
-                vel_vector = utils.polar_vector(speed, self.owner.angle + 90)
-                kwargs["b"].add(Bullet(self.pos, self.vel + vel_vector, self, self.owner))
+            if utils.get_ticks() - self.last_fire >= fire_rate:
+                self.last_fire = utils.get_ticks()
+                kwargs["v"].add(self)
         return super().update(dt, arena_radius, objects, sounds, **kwargs)
 
 
+class Volley:
+    """The drones that are ready to fire this tick. Their bullets are made together once every object has updated."""
+    def __init__(self):
+        self.drones: list[Drone] = []
+
+    def add(self, drone: Drone):
+        self.drones.append(drone)
+
+    def fire(self, bullets: utils.ParticleGroup):
+        """Fire a bullet from every drone in the volley and empty it."""
+        volleys: dict[GameObject, list[Drone]] = {}
+        for drone in self.drones:
+            volleys.setdefault(drone.owner, []).append(drone)
+        for owner, drones in volleys.items():
+            # The bullets of an owner's drones all get the same speed, direction and style.
+            speed = -BIG_BULLET_SPEED if owner.bullet_speed else -PLAYER_BULLET_SPEED
+            vel_vector = utils.polar_vector(speed, owner.angle + 90)
+            style = bullet_style(drones[0], owner)
+            bullets.add([Bullet(drone.pos, drone.vel + vel_vector, drone, owner, style) for drone in drones])
+        self.drones.clear()
+
+
 class Player(GameObject):
     def __init__(self, pos: Sequence[float]):
         super().__init__(pos, ObjectShape.PLAYER, ObjectType.PLAYER)
@@ -863,8 +994,11 @@ class Player(GameObject):
         self.big_thrust = 0.0
         self.phase = 0.0
         self.laser = 0.0
+        # Number of powerups picked up, for the stats.
+        self.powerups_collected = 0
 
     def apply_powerup(self, type_: PowerUpType, sounds, objects):
+        self.powerups_collected += 1
         d_count = 1
         if type_ is PowerUpType.HEALTH:
             self.health += 1
@@ -910,9 +1044,7 @@ class Player(GameObject):
         if self.dead:
             return True
         if self.health <= 0:
-            for _ in range(40):
-                vel_vector = utils.polar_vector(-random.randint(60, 120), random.randrange(360))
-                kwargs["d"].add(DebrisParticle(self.pos, vel_vector, self.color))
+            kwargs["d"].add(make_debris_burst(self.pos, self.color, kwargs["q"].debris_count))
             sounds.play(PLAYER_DEATH_SOUND)
             self.dead = True
             self.thrusting = False
@@ -928,9 +1060,9 @@ class Player(GameObject):
                 pass
             else:
                 fire_rate = BIG_PLAYER_FIRE_RATE if self.rapid_fire else PLAYER_FIRE_RATE
-                if pg.time.get_ticks() - self.last_fire >= fire_rate:
+                if utils.get_ticks() - self.last_fire >= fire_rate:
                     sounds.play(FIRE_GUN_SOUND)
-                    self.last_fire = pg.time.get_ticks()
+                    self.last_fire = utils.get_ticks()
                     speed = -BIG_BULLET_SPEED if self.bullet_speed else -PLAYER_BULLET_SPEED
                     vel_vector = utils.polar_vector(speed, self.angle + 90)
                     kwargs["b"].add(Bullet(self.gun_pos, self.vel + vel_vector, self, self))
@@ -940,11 +1072,12 @@ class Player(GameObject):
         self.vel += self.acc * dt
         return super().update(dt, arena_radius, objects, sounds, **kwargs)
 
-    def draw(self, screen: pg.Surface, light_source: Sequence[float], camera: Sequence[float]):
+    def draw(self, screen: pg.Surface, light_source: Sequence[float], camera: Sequence[float],
+             quality: QualityLevel = QUALITY_LEVELS[-1], scale: float = 1.0, batch: Optional[list] = None):
         if not self.dead:
             if self.phase:
                 self.color = pg.Color(Color.BLUE).lerp(Color.PHASE_COLOR, self.phase / 10)
                 if self.thrusting:
                     self.color = pg.Color((20, 20, 128)).lerp(Color.PHASING_COLOR, self.phase / 10)
-            super().draw(screen, light_source, camera)
+            super().draw(screen, light_source, camera, quality, scale, batch)
             self.color = COLORS[self.type]
@@ -0,0 +1,50 @@
+import numpy as np
+import pygame as pg
+
+import contacts
+
+
+def overlapping_cluster(seed: int, count: int = 30) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-60, 60, (count, 2))
+    vel = rng.uniform(-100, 100, (count, 2))
+    radius = rng.uniform(10, 30, count)
+    return pos, vel, radius
+
+
+def test_separate_conserves_momentum():
+    for seed in range(10):
+        pos, vel, radius = overlapping_cluster(seed)
+        a, b = contacts.find_contacts(pos, radius)
+        assert len(a)
+        momentum = vel.sum(0)
+        contacts.separate(pos, vel, radius, a, b)
+        np.testing.assert_allclose(vel.sum(0), momentum, atol=1e-9)
+
+
+def test_separate_conserves_momentum_of_one_body_hitting_a_cluster():
+    pos = np.array([(0.0, 0.0), (15.0, 0.0), (30.0, 5.0), (30.0, -5.0)])
+    vel = np.array([(0.0, 0.0), (-10.0, 0.0), (0.0, 0.0), (0.0, 0.0)])
+    radius = np.full(4, 10.0)
+    a, b = contacts.find_contacts(pos, radius)
+    contacts.separate(pos, vel, radius, a, b)
+    np.testing.assert_allclose(vel.sum(0), (-10, 0), atol=1e-9)
+
+
+def test_separate_pushes_pairs_apart():
+    pos, vel, radius = overlapping_cluster(0, 2)
+    pos[:] = (0, 0), (5, 0)
+    radius[:] = 10
+    contacts.separate(pos, vel, radius, np.array([0]), np.array([1]), 1)
+    assert np.hypot(*(pos[1] - pos[0])) >= 20 - 1e-9
+
+
+def test_separate_vectors_matches_separate():
+    pos, vel, radius = overlapping_cluster(3, 12)
+    a, b = contacts.find_contacts(pos, radius)
+    pos_vectors = [pg.Vector2(p.tolist()) for p in pos]
+    vel_vectors = [pg.Vector2(v.tolist()) for v in vel]
+    contacts.separate_vectors(pos_vectors, vel_vectors, radius.tolist(), list(zip(a.tolist(), b.tolist())))
+    contacts.separate(pos, vel, radius, a, b)
+    np.testing.assert_allclose(pos_vectors, pos, atol=1e-4)
+    np.testing.assert_allclose(vel_vectors, vel, atol=1e-4)
@@ -0,0 +1,163 @@
+# This file holds the entity tracer that records every game object on every frame for offline analysis.
+#
+# Each column is written straight into a preallocated memory-mapped .npy file. When a file fills up, the tracer
+# carries on in a new chunk of files, so nothing that was already written is ever copied. A frame index records
+# where each frame's entities are, along with the bullet and particle counts. The frame count is worked out from the
+# frame index when the trace is loaded, so a trace can be loaded even if the game crashed before closing the tracer.
+#
+# Load a trace with load_trace(folder) and use Trace.frame(i) or Trace.column(name) to get the data.
+import weakref
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import utils
+from world import World
+
+# Column name, dtype and shape of one row.
+ENTITY_COLUMNS = (
+    ("id", np.uint32, ()),
+    ("type", np.uint8, ()),
+    ("pos", np.float32, (2,)),
+    ("vel", np.float32, (2,)),
+    ("health", np.float32, ()),
+    ("shield", np.float32, ()),
+)
+FRAME_COLUMNS = (
+    ("frame", np.uint32, ()),
+    ("ticks", np.int64, ()),
+    ("wave", np.uint16, ()),
+    # Entity chunk, the index of the first entity in the chunk and the entity count.
+    ("chunk", np.uint32, ()),
+    ("start", np.uint32, ()),
+    ("count", np.uint32, ()),
+    ("bullets", np.uint32, ()),
+    ("particles", np.uint32, ()),
+)
+ENTITY_CHUNK_SIZE = 1 << 16
+FRAME_CHUNK_SIZE = 1 << 12
+
+
+class ChunkedColumns:
+    """Columns of rows written into memory-mapped .npy files, ``chunk_size`` rows per chunk."""
+    def __init__(self, folder: Path, name: str, columns: tuple, chunk_size: int):
+        self.folder = folder
+        self.name = name
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.chunk = -1
+        self.used = 0
+        self.capacity = 0
+        self.arrays: dict[str, np.memmap] = {}
+
+    def reserve(self, rows: int) -> tuple[int, int]:
+        """Make room for ``rows`` rows in one chunk and return the chunk number and the index of the first row."""
+        if self.used + rows > self.capacity:
+            self.flush()
+            self.chunk += 1
+            self.used = 0
+            self.capacity = max(self.chunk_size, rows)
+            self.arrays = {name: np.lib.format.open_memmap(self.folder / f"{self.name}_{self.chunk:04}_{name}.npy",
+                                                           "w+", dtype, (self.capacity, *shape))
+                           for name, dtype, shape in self.columns}
+        start = self.used
+        self.used += rows
+        return self.chunk, start
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+
+
+class Tracer:
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.entities = ChunkedColumns(self.folder, "entities", ENTITY_COLUMNS, ENTITY_CHUNK_SIZE)
+        self.frames = ChunkedColumns(self.folder, "frames", FRAME_COLUMNS, FRAME_CHUNK_SIZE)
+        self.frame = 0
+        # Ids that stay the same for an object across frames. Objects drop out when they are deleted.
+        self.ids: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.next_id = 0
+
+    def get_id(self, obj: object) -> int:
+        id_ = self.ids.get(obj)
+        if id_ is None:
+            id_ = self.ids[obj] = self.next_id
+            self.next_id += 1
+        return id_
+
+    def record(self, world: World):
+        """Append the game objects of the world as the next frame."""
+        get_id = self.get_id
+        rows = [(get_id(go), go.type.value, go.pos.x, go.pos.y, go.vel.x, go.vel.y, go.health, go.shield)
+                for go in world.game_objects]
+        count = len(rows)
+        chunk, start = self.entities.reserve(count)
+        if count:
+            data = np.array(rows, np.float64)
+            arrays = self.entities.arrays
+            end = start + count
+            arrays["id"][start:end] = data[:, 0]
+            arrays["type"][start:end] = data[:, 1]
+            arrays["pos"][start:end] = data[:, 2:4]
+            arrays["vel"][start:end] = data[:, 4:6]
+            arrays["health"][start:end] = data[:, 6]
+            arrays["shield"][start:end] = data[:, 7]
+
+        _, index = self.frames.reserve(1)
+        particles = len(world.thrust_particles) + len(world.debris_particles) + len(world.nebula_particles)
+        for name, value in zip(self.frames.arrays, (self.frame, utils.get_ticks(), world.wave, chunk, start, count,
+                                                    len(world.bullets), particles)):
+            self.frames.arrays[name][index] = value
+        self.frame += 1
+
+    def close(self):
+        """Flush the files. Rows past the last frame in the last chunks are unused."""
+        self.entities.flush()
+        self.frames.flush()
+
+
+class Trace:
+    """A trace loaded for analysis. Chunks are memory-mapped, so only the parts that are used are read."""
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        frames = self.load_columns("frames", FRAME_COLUMNS)
+        # Unused rows are all zeros, so the recorded frames are the rows numbered in order from the start.
+        numbered = frames["frame"] == np.arange(len(frames["frame"]))
+        self.frame_count = len(numbered) if numbered.all() else int(numbered.argmin())
+        self.frames = {column: array[:self.frame_count] for column, array in frames.items()}
+        self.entity_chunks: list[dict[str, np.ndarray]] = []
+        self.entity_count = 0
+        chunks, ends = self.frames["chunk"], self.frames["start"] + self.frames["count"]
+        for chunk in range(int(chunks.max()) + 1 if self.frame_count else 0):
+            used = int(ends[chunks == chunk].max(initial=0))
+            self.entity_chunks.append(self.load_chunk("entities", chunk, ENTITY_COLUMNS, used))
+            self.entity_count += used
+
+    def load_chunk(self, name: str, chunk: int, columns: tuple, rows: Optional[int] = None) -> dict[str, np.ndarray]:
+        return {column: np.load(self.folder / f"{name}_{chunk:04}_{column}.npy", mmap_mode="r")[:rows]
+                for column, _, _ in columns}
+
+    def load_columns(self, name: str, columns: tuple) -> dict[str, np.ndarray]:
+        """Load every chunk of the columns and join them into one array per column."""
+        chunks = []
+        while (self.folder / f"{name}_{len(chunks):04}_{columns[0][0]}.npy").exists():
+            chunks.append(self.load_chunk(name, len(chunks), columns))
+        return {column: np.concatenate([c[column] for c in chunks]) if chunks else np.zeros((0, *shape), dtype)
+                for column, dtype, shape in columns}
+
+    def frame(self, index: int) -> dict[str, np.ndarray]:
+        """Return the entity columns of one frame."""
+        start, count = int(self.frames["start"][index]), int(self.frames["count"][index])
+        chunk = self.entity_chunks[int(self.frames["chunk"][index])]
+        return {column: array[start:start + count] for column, array in chunk.items()}
+
+    def column(self, name: str) -> np.ndarray:
+        """Return one entity column for every frame joined together, in frame order."""
+        return np.concatenate([chunk[name] for chunk in self.entity_chunks])
+
+
+def load_trace(folder: Path) -> Trace:
+    return Trace(folder)
@@ -1,11 +1,19 @@
 # This file holds useful utility functions and classes.
+import asyncio
+import heapq
+import itertools
+import math
 import random
+from array import array
+from collections import deque
 from pathlib import Path
 import sys
+import time
+import weakref
 
 import pygame as pg
 
-from typing import Optional, Sequence, Callable, Hashable, Iterable
+from typing import Optional, Sequence, Callable, Hashable, Iterable, Iterator
 
 
 class Sounds:
@@ -34,6 +42,75 @@ def collide_circle_line(p1: pg.Vector2, p2: pg.Vector2, center: pg.Vector2, radi
     return b**2 - 4 * a * c >= 0
 
 
+def collide_circle_segment(p1: pg.Vector2, p2: pg.Vector2, center: pg.Vector2, radius: float) -> Optional[float]:
+    """Return how far along the line segment from ``p1`` to ``p2`` it first touches a circle, from 0 to 1.
+
+    Returns 0 if ``p1`` starts inside the circle and ``None`` if the segment misses the circle.
+    """
+    v = p2 - p1
+    w = p1 - center
+    c = w * w - radius**2
+    if c <= 0:
+        return 0.0
+    a = v * v
+    if a == 0:
+        return None
+    b = 2 * v.dot(w)
+    discriminant = b**2 - 4 * a * c
+    if discriminant < 0:
+        return None
+    # The nearest root is the entry point. Both roots are negative if the circle is behind the segment.
+    t = (-b - math.sqrt(discriminant)) / (2 * a)
+    return t if 0 <= t <= 1 else None
+
+
+def draw_clipped_ring(surface: pg.Surface, color, center: Sequence[float], radius: float, width: int,
+                      aa: bool = True, segment_length: float = 16):
+    """Draw a ring like ``pg.draw.circle(surface, color, center, radius, width)``, but only the visible arc.
+
+    The arc is drawn as a polygon with segments about ``segment_length`` pixels long, with anti-aliased edges if
+    ``aa`` is ``True``. The cost depends on the size of the surface, not on the radius of the ring.
+    """
+    rect = surface.get_rect()
+    center = pg.Vector2(center)
+    inner_radius = max(radius - width, 0)
+    # Skip if the ring is entirely outside the view.
+    closest = pg.Vector2(pg.math.clamp(center.x, rect.left, rect.right), pg.math.clamp(center.y, rect.top, rect.bottom))
+    if closest.distance_squared_to(center) > radius ** 2:
+        return
+    # Skip if the view is entirely inside the hole of the ring.
+    corners = (rect.topleft, rect.topright, rect.bottomleft, rect.bottomright)
+    if all(center.distance_squared_to(corner) < inner_radius ** 2 for corner in corners):
+        return
+    # Find the angle span around the view center where the edges of the ring are within the view's bounding circle.
+    view_center = pg.Vector2(rect.center)
+    view_radius = view_center.distance_to(rect.topleft) + 1
+    offset = view_center - center
+    distance = offset.length()
+    half_span = 180.0 if distance == 0 else 0.0
+    for r in (radius, inner_radius):
+        if half_span >= 180 or r == 0:
+            break
+        cos = (r ** 2 + distance ** 2 - view_radius ** 2) / (2 * r * distance)
+        half_span = max(half_span, 180.0 if cos <= -1 else math.degrees(math.acos(min(cos, 1))))
+    # The whole ring is close to the view, so it is cheap to draw normally.
+    if half_span >= 180:
+        if aa:
+            pg.draw.aacircle(surface, color, center, radius, width)
+        else:
+            pg.draw.circle(surface, color, center, radius, width)
+        return
+    start = pg.Vector2().angle_to(offset) - half_span
+    steps = pg.math.clamp(int(math.radians(half_span * 2) * radius / segment_length) + 1, 2, 512)
+    angles = [start + half_span * 2 * i / steps for i in range(steps + 1)]
+    outer = [center + polar_vector(radius, angle) for angle in angles]
+    inner = [center + polar_vector(inner_radius, angle) for angle in reversed(angles)]
+    pg.draw.polygon(surface, color, outer + inner)
+    if aa:
+        pg.draw.aalines(surface, color, False, outer)
+        pg.draw.aalines(surface, color, False, inner)
+
+
 def polar_vector(length: float, angle: float) -> pg.Vector2:
     """Return a Vector2 with the given length and angle in degrees."""
     vec = pg.Vector2()
@@ -46,6 +123,34 @@ def random_vector(max_len: int, min_len: int = 0) -> pg.Vector2:
     return polar_vector(random.randint(min_len, max_len), random.randrange(360))
 
 
+class SimClock:
+    """A clock that only moves when it is advanced, so the game can run faster than real time."""
+    def __init__(self):
+        self.time = 0.0
+
+    def advance(self, dt: float):
+        self.time += dt * 1000
+
+    def get_ticks(self) -> int:
+        return int(self.time)
+
+
+# Function that returns the game time in ms. The pygame clock unless a simulated clock is set.
+_ticks_func: Callable[[], int] = pg.time.get_ticks
+
+
+def get_ticks() -> int:
+    """Return the game time in ms. All game timers should use this instead of ``pg.time.get_ticks``."""
+    return _ticks_func()
+
+
+def set_clock(ticks_func: Callable[[], int] = pg.time.get_ticks):
+    """Make ``get_ticks`` use another clock, such as ``SimClock.get_ticks``. Call it without arguments to go back to
+    the pygame clock."""
+    global _ticks_func
+    _ticks_func = ticks_func
+
+
 def load_image(filename: str | Path, convert: bool = True, alpha: bool = False) -> pg.Surface:
     """Load and return a ``Surface`` object from the given filename.
 
@@ -78,11 +183,187 @@ def setup_window(title: str, icon_path: Optional[str | Path] = None, big_icon_pa
         pg.display.set_icon(icon_image)
 
 
-def create_display(size: Sequence[float], fullscreen: bool, flags: int = 0) -> pg.Surface:
-    """Toggle the display to and from fullscreen. Fullscreen resolution is the display size."""
+def create_display(size: Sequence[float], fullscreen: bool, flags: int = 0, vsync: bool = False) -> pg.Surface:
+    """Toggle the display to and from fullscreen. Fullscreen resolution is the display size.
+
+    If ``vsync`` is ``True``, vsync is requested from the display. Falls back to no vsync if it is unsupported.
+    """
     if fullscreen:
-        return pg.display.set_mode((0, 0), pg.FULLSCREEN | flags)
-    return pg.display.set_mode(size, flags)  # noqa
+        size, flags = (0, 0), pg.FULLSCREEN | flags
+    if vsync:
+        try:
+            screen = pg.display.set_mode(size, flags, vsync=1)  # noqa
+            convert_cached_images()
+            return screen
+        except pg.error:
+            pass
+    screen = pg.display.set_mode(size, flags)  # noqa
+    convert_cached_images()
+    return screen
+
+
+# How often the pacer checks the event queue while waiting for input.
+IDLE_POLL_MS = 5
+
+
+class FramePacer:
+    """Frame pacing policy that keeps the game loop from busy-looping when nothing is happening.
+
+    While active, the frame rate is capped at ``active_cap`` (0 is uncapped). While idle, the frame rate is capped
+    at ``idle_cap`` (0 is uncapped) and ``get_events_async`` waits up to ``idle_timeout_ms`` for an event before
+    the next frame. The rest of each capped frame is slept off with ``asyncio.sleep``, so other tasks run in the
+    meantime. While the window is unfocused or minimized, the pacer also sleeps for ``unfocused_sleep_ms`` every
+    frame and the caller should skip rendering.
+    """
+    def __init__(self, active_cap: int = 0, idle_cap: int = 30, unfocused_sleep_ms: int = 100,
+                 idle_timeout_ms: int = 500):
+        self.clock = pg.time.Clock()
+        self.active_cap = active_cap
+        self.idle_cap = idle_cap
+        self.unfocused_sleep_ms = unfocused_sleep_ms
+        self.idle_timeout_ms = idle_timeout_ms
+        self.focused = True
+        self.minimized = False
+        # Time the last frame spent updating and drawing, not counting the flip or the wait for the next frame.
+        self.work_ms = 0.0
+        self.frame_start = time.perf_counter()
+        self.work_start = self.frame_start
+
+    @property
+    def visible(self) -> bool:
+        return self.focused and not self.minimized
+
+    def get_events(self) -> list[pg.Event]:
+        """Return the pending events and keep track of the window's focus."""
+        events = pg.event.get()
+        for event in events:
+            if event.type == pg.WINDOWFOCUSLOST:
+                self.focused = False
+            elif event.type == pg.WINDOWFOCUSGAINED:
+                self.focused = True
+            elif event.type == pg.WINDOWMINIMIZED:
+                self.minimized = True
+            elif event.type == pg.WINDOWRESTORED:
+                self.minimized = False
+        return events
+
+    async def get_events_async(self, idle: bool) -> list[pg.Event]:
+        """Like ``get_events``, but if idle and there are none, wait up to ``idle_timeout_ms`` for one to arrive. The
+        queue is checked every ``IDLE_POLL_MS`` with ``asyncio.sleep``, so other tasks run in the meantime."""
+        events = self.get_events()
+        if idle and not events and self.visible:
+            deadline = time.perf_counter() + self.idle_timeout_ms / 1000
+            while not pg.event.peek() and time.perf_counter() < deadline:
+                await asyncio.sleep(IDLE_POLL_MS / 1000)
+            # The wait isn't part of the frame's work.
+            self.work_start = time.perf_counter()
+            events = self.get_events()
+        return events
+
+    def end_work(self):
+        """Stop the work timer of the frame. Call it right before ``pg.display.flip``, which can wait for vsync."""
+        self.work_ms = (time.perf_counter() - self.work_start) * 1000
+
+    async def tick_async(self, idle: bool) -> float:
+        """Wait for the next frame according to the pacing policy and return the frame time in seconds. Always yields
+        once."""
+        elapsed_ms = (time.perf_counter() - self.frame_start) * 1000
+        cap = self.idle_cap if idle else self.active_cap
+        delay_ms = max(0.0, 1000 / cap - elapsed_ms) if cap else 0.0
+        if not self.visible:
+            delay_ms += self.unfocused_sleep_ms
+        await asyncio.sleep(delay_ms / 1000)
+        self.frame_start = time.perf_counter()
+        self.work_start = self.frame_start
+        return self.clock.tick() / 1000
+
+    def get_fps(self) -> float:
+        return self.clock.get_fps()
+
+
+class QualityGovernor:
+    """Step a quality level down when the rolling average frame time goes over budget, and back up when there is
+    headroom.
+
+    Levels go from 0 (lowest) to ``max_level``. After every change, a full window of ``sample_count`` new frames is
+    collected before the level can change again.
+    """
+    def __init__(self, max_level: int, target_ms: float, headroom: float = 0.6, sample_count: int = 60):
+        self.max_level = max_level
+        self.level = max_level
+        self.target_ms = target_ms
+        self.headroom = headroom
+        self.samples: deque[float] = deque(maxlen=sample_count)
+
+    @property
+    def average_ms(self) -> float:
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    def update(self, frame_ms: float) -> int:
+        """Add a frame time sample and return the new quality level."""
+        self.samples.append(frame_ms)
+        if len(self.samples) < self.samples.maxlen:
+            return self.level
+        average = self.average_ms
+        if average > self.target_ms and self.level > 0:
+            self.level -= 1
+            self.samples.clear()
+        elif average < self.target_ms * self.headroom and self.level < self.max_level:
+            self.level += 1
+            self.samples.clear()
+        return self.level
+
+
+# Events that count as player input for the latency monitor.
+INPUT_EVENTS = frozenset((pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.KEYDOWN, pg.KEYUP))
+
+
+class LatencyMonitor:
+    """Rolling distributions of how old the input is at each stage of a frame, in ms.
+
+    Input events are timestamped when they are polled, so the time they spent in the queue before that isn't
+    counted. ``INPUT > SIM`` is from an input event to the end of the update that used it, ``INPUT > FLIP`` is from
+    an input event to the flip that showed it and ``AIM > FLIP`` is from the last aim sample to the flip.
+    """
+    STAGES = ("INPUT > SIM", "INPUT > FLIP", "AIM > FLIP")
+
+    def __init__(self, sample_count: int = 600):
+        self.samples: dict[str, deque[float]] = {stage: deque(maxlen=sample_count) for stage in self.STAGES}
+        self.input_times: list[float] = []
+        self.aim_time: Optional[float] = None
+
+    def add_events(self, events: Iterable[pg.Event]):
+        now = time.perf_counter()
+        self.input_times += [now for event in events if event.type in INPUT_EVENTS]
+
+    def aimed(self):
+        """Call when the aim angle is sampled."""
+        self.aim_time = time.perf_counter()
+
+    def simulated(self):
+        """Call when the update that used this frame's input is done."""
+        now = time.perf_counter()
+        self.samples["INPUT > SIM"].extend((now - t) * 1000 for t in self.input_times)
+
+    def flipped(self):
+        """Call right after the display flip. Starts the next frame."""
+        now = time.perf_counter()
+        self.samples["INPUT > FLIP"].extend((now - t) * 1000 for t in self.input_times)
+        if self.aim_time is not None:
+            self.samples["AIM > FLIP"].append((now - self.aim_time) * 1000)
+        self.input_times.clear()
+        self.aim_time = None
+
+    def percentiles(self, stage: str, percents: Sequence[float] = (50, 95, 99)) -> list[float]:
+        samples = sorted(self.samples[stage])
+        if not samples:
+            return [0.0] * len(percents)
+        return [samples[min(len(samples) - 1, int(len(samples) * percent / 100))] for percent in percents]
+
+    def report(self) -> str:
+        """Return a line per stage with the median, 95th and 99th percentile and the worst sample."""
+        return "\n".join(f"{stage}: {" / ".join(f"{ms:.1f}" for ms in self.percentiles(stage))} MS, "
+                         f"MAX {max(self.samples[stage], default=0.0):.1f}" for stage in self.STAGES)
 
 
 def make_circle_image(radius: int, color: Sequence[int],
@@ -98,10 +379,87 @@ def make_circle_image(radius: int, color: Sequence[int],
     return image
 
 
+def convert_image(image: pg.Surface) -> pg.Surface:
+    """Return the image in the display's pixel format so it blits without conversion. Color keys are RLE
+    accelerated. The image is returned as it is if there is no display."""
+    if pg.display.get_surface() is None:
+        return image
+    if image.get_flags() & pg.SRCALPHA:
+        return image.convert_alpha()
+    colorkey = image.get_colorkey()
+    image = image.convert()
+    if colorkey is not None:
+        image.set_colorkey(colorkey, pg.RLEACCEL)
+    return image
+
+
+# Every image cache, so their images can be converted again when the display mode changes.
+_image_caches: weakref.WeakSet["ImageCache"] = weakref.WeakSet()
+
+
+def convert_cached_images():
+    """Convert the images in every image cache to the current display format."""
+    for image_cache in _image_caches:
+        image_cache.convert()
+
+
+# Width of a texture atlas. Its height grows to fit the images.
+ATLAS_WIDTH = 1024
+
+
+class TextureAtlas:
+    """Small images packed into one surface in the display format.
+
+    The images are packed in rows, tallest first. Each one is handed out as a subsurface of the atlas that shares its
+    pixels, since ``fblits`` takes no source rects. The images must all have per-pixel alpha or all share a color key.
+    """
+    def __init__(self, images: dict[Hashable, pg.Surface], width: int = ATLAS_WIDTH, padding: int = 1):
+        self.sources = dict(images)
+        self.rects: dict[Hashable, pg.Rect] = {}
+        x = y = row_height = 0
+        for key, image in sorted(self.sources.items(), key=lambda item: item[1].height, reverse=True):
+            if x + image.width > width:
+                x, y, row_height = 0, y + row_height + padding, 0
+            self.rects[key] = pg.Rect((x, y), image.size)
+            x += image.width + padding
+            row_height = max(row_height, image.height)
+        self.size = (width, max(y + row_height, 1))
+        self.surface = pg.Surface(self.size)
+        self.images: dict[Hashable, pg.Surface] = {}
+        self.build()
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def build(self):
+        """Copy the images into a new atlas surface in the current display format."""
+        alpha = any(image.get_flags() & pg.SRCALPHA for image in self.sources.values())
+        colorkey = next((image.get_colorkey() for image in self.sources.values()), None)
+        self.surface = pg.Surface(self.size, pg.SRCALPHA if alpha else 0)
+        if pg.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha() if alpha else self.surface.convert()
+        if alpha:
+            # The atlas starts out transparent, so taking the max of each channel copies the pixels as they are.
+            self.surface.fill((0, 0, 0, 0))
+            for key, image in self.sources.items():
+                self.surface.blit(image, self.rects[key], special_flags=pg.BLEND_RGBA_MAX)
+        else:
+            if colorkey is not None:
+                self.surface.fill(colorkey)
+                self.surface.set_colorkey(colorkey)
+            for key, image in self.sources.items():
+                self.surface.blit(image, self.rects[key])
+        self.images = {key: self.surface.subsurface(rect) for key, rect in self.rects.items()}
+
+
 class ImageCache:
+    """Images made on demand and kept in the display format."""
     def __init__(self, make_image_func: Callable[[Hashable], pg.Surface]):
         self.cache: dict[Hashable, pg.Surface] = {}
+        self.scaled_cache: dict[tuple[Hashable, float], pg.Surface] = {}
         self.make_image = make_image_func
+        self.atlas: Optional[TextureAtlas] = None
+        _image_caches.add(self)
 
     def __len__(self) -> int:
         return len(self.cache)
@@ -112,16 +470,50 @@ class ImageCache:
 
     def clear_cache(self):
         self.cache: dict[Hashable, pg.Surface] = {}
+        self.scaled_cache: dict[tuple[Hashable, float], pg.Surface] = {}
+        self.atlas = None
 
     def get_image(self, item: Hashable) -> pg.Surface:
         if item not in self.cache:
-            self.cache[item] = self.make_image(item)
+            self.cache[item] = convert_image(self.make_image(item))
         return self.cache[item]
 
+    def warm_up(self, items: Iterable[Hashable]):
+        """Make the images ahead of time, so they aren't made in the middle of a frame."""
+        for item in items:
+            self.get_image(item)
+
+    def pack(self):
+        """Pack the images made so far into one texture atlas. Images made after this are kept on their own."""
+        self.atlas = TextureAtlas(self.cache)
+        self.cache.update(self.atlas.images)
+
+    def convert(self):
+        """Convert the images to the current display format, such as after the display mode changed."""
+        packed = {}
+        if self.atlas is not None:
+            self.atlas.build()
+            packed = self.atlas.images
+        self.cache = {item: packed[item] if item in packed else convert_image(image)
+                      for item, image in self.cache.items()}
+        self.scaled_cache = {key: convert_image(image) for key, image in self.scaled_cache.items()}
+
+    def get_scaled_image(self, item: Hashable, scale: float) -> pg.Surface:
+        """Return the image for ``item`` scaled by ``scale``, for drawing at a lower render scale."""
+        if scale == 1:
+            return self.get_image(item)
+        key = (item, scale)
+        if key not in self.scaled_cache:
+            self.scaled_cache[key] = convert_image(pg.transform.scale_by(self.get_image(item), scale))
+        return self.scaled_cache[key]
+
 
 class Particle:
+    # Time in ms when the particle expires, or None if it only goes away when its update returns False.
+    end_time: Optional[int] = None
+
     def update(self, dt: float, *args, **kwargs) -> bool:  # noqa
-        """Return False when particle should be removed."""
+        """Return False when particle should be removed. Expired particles are removed by their group."""
         return True
 
     def draw_pos(self, image: pg.Surface) -> Sequence[float]:
@@ -132,35 +524,139 @@ class Particle:
 
 
 class ParticleGroup:
+    """A group of particles that are updated and drawn together.
+
+    Particles are kept in an insertion ordered dict so removing one doesn't copy the others. Particles with an
+    ``end_time`` also go into a heap ordered by that time, so each update only has to pop the expired ones.
+    """
     def __init__(self, image_cache: ImageCache, blend: int = pg.BLENDMODE_NONE,
-                 particles: Optional[list[Particle]] = None):
-        self.particles: list[Particle] = particles if particles is not None else []
+                 particles: Optional[Iterable[Particle]] = None):
+        self.particles: dict[Particle, None] = {}
+        # Heap of (end time, insertion number, particle). Entries of particles that were removed early stay in the
+        # heap until they expire.
+        self.expiry: list[tuple[int, int, Particle]] = []
+        self.counter = itertools.count()
         self.image_cache = image_cache
         self.blend = blend
+        if particles is not None:
+            self.add(particles)
 
     def __len__(self) -> int:
         return len(self.particles)
 
+    def __iter__(self) -> Iterator[Particle]:
+        return iter(self.particles)
+
     @property
     def size(self) -> int:
         return len(self)
 
     def add(self, particles: Particle | Iterable[Particle]):
         if isinstance(particles, Particle):
-            self.particles.append(particles)
-        else:
-            self.particles.extend(particles)
+            particles = (particles,)
+        for p in particles:
+            self.particles[p] = None
+            if p.end_time is not None:
+                heapq.heappush(self.expiry, (p.end_time, next(self.counter), p))
 
     def clear(self):
         """Clear the group of all the particles."""
-        self.particles = []
+        self.particles = {}
+        self.expiry = []
+
+    def trim(self, size: int):
+        """Remove the oldest particles until the group has at most ``size`` particles."""
+        if len(self.particles) > size:
+            for p in list(itertools.islice(self.particles, len(self.particles) - size)):
+                del self.particles[p]
 
     def update(self, dt: float, *args, **kwargs):
-        self.particles = [p for p in self.particles if p.update(dt, *args, **kwargs)]
+        # Remove the expired particles first, so they aren't updated.
+        ticks = get_ticks()
+        expiry = self.expiry
+        while expiry and expiry[0][0] <= ticks:
+            self.particles.pop(heapq.heappop(expiry)[2], None)
+        for p in [p for p in self.particles if not p.update(dt, *args, **kwargs)]:
+            del self.particles[p]
 
     def _get_draw_tuple(self, p: Particle, camera: pg.Vector2) -> tuple[pg.Surface, Sequence[float]]:
         image = self.image_cache.get_image(p.cache_lookup())
         return image, p.draw_pos(image) + camera
 
-    def draw(self, screen: pg.Surface, camera: pg.Vector2, blend: int = pg.BLENDMODE_NONE):
-        screen.fblits([self._get_draw_tuple(p, camera) for p in self.particles], blend if blend else self.blend)  # noqa
+    def _get_scaled_draw_tuple(self, p: Particle, camera: pg.Vector2,
+                               scale: float) -> tuple[pg.Surface, Sequence[float]]:
+        key = p.cache_lookup()
+        return (self.image_cache.get_scaled_image(key, scale),
+                (p.draw_pos(self.image_cache.get_image(key)) + camera) * scale)
+
+    def draw(self, screen: pg.Surface, camera: pg.Vector2, blend: int = pg.BLENDMODE_NONE, scale: float = 1.0):
+        if scale == 1:
+            blits = [self._get_draw_tuple(p, camera) for p in self.particles]
+        else:
+            blits = [self._get_scaled_draw_tuple(p, camera, scale) for p in self.particles]
+        screen.fblits(blits, blend if blend else self.blend)  # noqa
+
+
+class Burst:
+    """A burst of particles that fly out from one point in straight lines at constant speeds.
+
+    ``records`` holds four floats per particle: x velocity, y velocity, radius and life time in ms. They must be
+    sorted by life time from longest to shortest. Particle positions are computed from the elapsed time when drawn,
+    so a burst never needs to be updated.
+    """
+    def __init__(self, origin: Sequence[float], start_time: int, seed: int, color, records: array):
+        self.origin = pg.Vector2(origin)
+        self.start_time = start_time
+        self.seed = seed
+        self.color = color
+        self.records = records
+        self.life_time = records[3] if records else 0
+
+    def __len__(self) -> int:
+        return len(self.records) // 4
+
+
+class BurstGroup:
+    def __init__(self, image_cache: ImageCache, blend: int = pg.BLENDMODE_NONE):
+        self.bursts: list[Burst] = []
+        self.image_cache = image_cache
+        self.blend = blend
+
+    def __len__(self) -> int:
+        return len(self.bursts)
+
+    @property
+    def size(self) -> int:
+        return len(self)
+
+    def add(self, burst: Burst):
+        self.bursts.append(burst)
+
+    def clear(self):
+        """Clear the group of all the bursts."""
+        self.bursts = []
+
+    def update(self, dt: float, *args, **kwargs):  # noqa
+        """Remove the bursts whose particles have all expired."""
+        ticks = get_ticks()
+        self.bursts = [b for b in self.bursts if ticks - b.start_time < b.life_time]
+
+    def draw(self, screen: pg.Surface, camera: Sequence[float], blend: int = pg.BLENDMODE_NONE,
+             scale: float = 1.0):
+        ticks = get_ticks()
+        get_image = self.image_cache.get_scaled_image
+        blits = []
+        for burst in self.bursts:
+            elapsed = ticks - burst.start_time
+            seconds = elapsed / 1000
+            x, y = burst.origin.x + camera[0], burst.origin.y + camera[1]
+            records = burst.records
+            for i in range(0, len(records), 4):
+                # Records are sorted by life time, so the rest have expired too.
+                if records[i + 3] <= elapsed:
+                    break
+                radius = records[i + 2]
+                blits.append((get_image((int(radius), burst.color), scale),
+                              ((x + records[i] * seconds - radius) * scale,
+                               (y + records[i + 1] * seconds - radius) * scale)))
+        screen.fblits(blits, blend if blend else self.blend)  # noqa
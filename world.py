@@ -0,0 +1,228 @@
+# This file holds the game state and the simulation that advances it.
+import random
+
+import pygame as pg
+
+import utils
+import sprites
+import contacts
+from sprites import ObjectType
+
+
+class World:
+    def __init__(self, image_cache: utils.ImageCache):
+        # Create and reference the player object.
+        # The first player is the local player. Other players can join in multiplayer.
+        self.player = sprites.Player((0, 0))
+        # Make menu button say "PLAY" instead of "RESUME".
+        self.player.dead = True
+        self.players: list[sprites.Player] = [self.player]
+        self.game_objects: list[sprites.GameObject] = [self.player]
+
+        self.arena_radius = 1000
+        self.edge_portal = False
+        self.score = 0
+        self.wave = 1
+        self.death_timer = 0
+        self.wave_timer = 0
+        self.enemies_left = 0
+        self.new_wave = False
+        # Each wave has this many enemies plus the wave number.
+        self.base_enemies = 2
+        # Most drones each player carries into the next wave. None for no limit.
+        self.drone_cap = sprites.DRONE_SWARM_CAP
+
+        # Number of objects in each level of detail band, for the debug stats.
+        self.lod_counts = [0] * (len(sprites.LOD_BANDS) + 1)
+
+        # Particle groups.
+        self.thrust_particles = utils.ParticleGroup(image_cache, pg.BLEND_ADD)
+        self.bullets = utils.ParticleGroup(image_cache)
+        self.debris_particles = utils.BurstGroup(image_cache)
+        self.nebula_particles = utils.ParticleGroup(image_cache, pg.BLEND_ADD)
+        # Drones that are ready to fire this tick.
+        self.volley = sprites.Volley()
+
+    def clear_particles(self):
+        """Delete the remaining thrust, debris and bullet particles."""
+        self.thrust_particles.clear()
+        self.debris_particles.clear()
+        self.bullets.clear()
+
+    @property
+    def all_dead(self) -> bool:
+        return all(player.dead for player in self.players)
+
+    def add_player(self) -> sprites.Player:
+        """Add another player to the game. They join dead if everyone else is dead."""
+        player = sprites.Player((0, 0))
+        player.dead = self.all_dead
+        self.players.append(player)
+        self.game_objects.append(player)
+        return player
+
+    def remove_player(self, player: sprites.Player):
+        """Remove a player from the game, handing their enemies and drones to the remaining players."""
+        self.players.remove(player)
+        if player in self.game_objects:
+            self.game_objects.remove(player)
+        for go in self.game_objects:
+            if getattr(go, "target", None) is player:
+                go.target = sprites.nearest_player(go.pos, self.players)  # noqa
+            if getattr(go, "owner", None) is player:
+                go.owner = sprites.nearest_player(go.pos, self.players)  # noqa
+
+    @staticmethod
+    def reset_player(player: sprites.Player):
+        player.health = sprites.HEALTH[player.shape]
+        player.dead = False
+        player.pos = pg.Vector2()
+        player.vel = pg.Vector2()
+        player.bullet_damage_up = 0
+        player.rapid_fire = 0
+        player.bullet_speed = 0
+        player.big_thrust = 0.0
+        player.phase = 0.0
+        player.laser = 0.0
+
+    def restart(self):
+        """Reset the game back to the start of the first wave."""
+        self.death_timer = 0
+        self.score = 0
+        self.wave = 1
+        self.new_wave = True
+        self.clear_particles()
+        # Clear other objects.
+        self.game_objects = list(self.players)
+        # Reset players.
+        for player in self.players:
+            self.reset_player(player)
+
+    def spawn_wave(self):
+        """Set up the enemies for the current wave."""
+        wave = self.wave
+        self.new_wave = False
+        self.arena_radius = 900 + (wave * 100)
+        for _ in range(self.base_enemies + wave):
+            pos = utils.random_vector(self.arena_radius, 500)
+            shape = random.choice(sprites.RANDOM_SHAPES)
+            t = random.choice(sprites.get_types(wave))
+            o = None
+            # Enemies that hunt a player pick one of them.
+            player = random.choice(self.players)
+            if t is ObjectType.ASTEROID:
+                self.game_objects.append(o := sprites.Asteroid(pos, shape))
+            if t is ObjectType.ORBITER:
+                self.game_objects.append(o := sprites.Orbiter(pos, shape))
+            if t is ObjectType.RUNNER:
+                self.game_objects.append(o := sprites.Runner(pos, shape, player))
+            if t is ObjectType.CHASER:
+                self.game_objects.append(o := sprites.Chaser(pos, shape, player))
+            if t is ObjectType.GUNNER:
+                self.game_objects.append(o := sprites.Gunner(pos, shape, player))
+            if o:
+                if wave > 6 and random.random() > 0.9:
+                    o.shield = sprites.MAX_SHIELD
+                if wave > 9 and random.random() > 0.5:
+                    o.shield = sprites.MAX_SHIELD
+
+                if wave > 5 and random.random() > 0.25:
+                    for _ in range(random.randint(1, 5 if wave > 9 else 2)):
+                        self.game_objects.append(d := sprites.Drone(o))
+                        if wave > 9 and random.random() > 0.5:
+                            d.shield = sprites.MAX_SHIELD
+
+    def next_wave(self):
+        """Advance to the next wave, bringing the players and their drones back to the arena center."""
+        self.wave_timer = 0
+        self.wave += 1
+        self.new_wave = True
+        self.clear_particles()
+        # Reset players. Players that died during the wave come back.
+        for player in self.players:
+            if player.dead:
+                self.reset_player(player)
+            player.pos = pg.Vector2()
+            player.vel = pg.Vector2()
+            player.acc = pg.Vector2()
+            player.thrusting = False
+        # Reset player drones.
+        drone_counts = {}
+        for go in self.game_objects:
+            if go.type is ObjectType.PLAYER_DRONE:
+                player = go.owner  # noqa
+                drone_counts[player] = drone_counts.get(player, 0) + 1
+                # Only allow player to carry so many drones with them into the next wave.
+                if self.drone_cap is not None and drone_counts[player] > self.drone_cap:
+                    go.health = 0
+                    go.be_silent = True
+                go.pos = player.pos + utils.random_vector(100, 50)
+                go.vel = (player.pos - go.pos).rotate(random.choice((90, -90)))
+                go.vel.scale_to_length(random.randint(50, 200))
+                go.acc = pg.Vector2()
+                go.turn_speed = random.randint(-100, 100)
+            # Delete all the leftover powerups.
+            if go.type is ObjectType.POWER_UP:
+                go.health = 0
+
+    def update(self, dt: float, sounds: utils.Sounds, screen: pg.Surface, camera: pg.Vector2, effects: bool,
+               quality: sprites.QualityLevel):
+        # Set up a new wave.
+        if self.new_wave:
+            self.spawn_wave()
+
+        # Increase death timer once everyone is dead.
+        if self.all_dead:
+            self.death_timer += dt
+
+        # Spawn particles.
+        self.nebula_particles.trim(quality.nebula_cap)
+        if effects and self.nebula_particles.size < quality.nebula_cap:
+            self.nebula_particles.add(sprites.NebulaParticle())
+        for player in self.players:
+            if player.thrusting:
+                vel_vector = utils.polar_vector(random.randint(150, 200),
+                                                player.angle + 90 + random.randint(-15, 15))
+                big = player.big_thrust > 0
+                self.thrust_particles.add(sprites.ThrustParticle(player.thrust_pos, player.vel + vel_vector, big))
+
+        # Update game objects.
+        # Far away objects are updated at a lower rate depending on their level of detail band.
+        self.lod_counts = [0] * (len(sprites.LOD_BANDS) + 1)
+        updated_objects = []
+        for go in self.game_objects:
+            band = go.lod_band(self.players, screen, camera)
+            self.lod_counts[band] += 1
+            if go.lod_update(dt, band, self.arena_radius, self.game_objects, sounds,
+                             d=self.debris_particles, p=self.players, s=screen, c=camera,
+                             b=self.bullets, e=self.edge_portal, q=quality, v=self.volley):
+                updated_objects.append(go)
+        self.game_objects = updated_objects
+        # Fire the bullets of all the drones that are ready at once.
+        self.volley.fire(self.bullets)
+        # Bounce the objects that ran into each other.
+        contacts.solve_contacts(self.game_objects, sounds)
+        # Count remaining enemies.
+        self.enemies_left = len([go for go in self.game_objects if go.type in sprites.ENEMY_MARKERS])
+
+        # Increase wave timer.
+        if not self.enemies_left and not self.all_dead:
+            self.wave_timer += dt
+            # If player has won for two seconds, set up the next wave.
+            if self.wave_timer > 2:
+                self.next_wave()
+
+        # Update particles.
+        if effects:
+            self.nebula_particles.update(dt, arena_radius=self.arena_radius)
+        self.thrust_particles.update(dt)
+        self.debris_particles.update(dt)
+        # Update bullets and add scoring.
+        scores = []
+        # Bullets don't damage their own faction, so each side only checks the objects outside of it.
+        player_targets = [go for go in self.game_objects if go.type not in sprites.PLAYER_FACTION]
+        enemy_targets = [go for go in self.game_objects if go.type not in sprites.ENEMY_FACTION]
+        self.bullets.update(dt, arena_radius=self.arena_radius, game_objects=self.game_objects, sounds=sounds,
+                            player_targets=player_targets, enemy_targets=enemy_targets,
+                            scores=scores)
+        self.score += sum(scores)